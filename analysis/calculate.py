@@ -4,8 +4,35 @@ import argparse
 import pandas as pd
 import numpy as np
 import sys, glob
+import os
 from pandas.errors import EmptyDataError
 
+from metrics import METRICS
+
+def robust_z_scores(values):
+    """
+    Modified z-scores (Iglewicz and Hoaglin): 0.6745 * (x - median) / MAD.
+    When the MAD is 0 (most samples are equal), the mean absolute deviation
+    scaled by 1.253314 takes its place. Fewer than three samples score 0,
+    as there is no majority to tell the outlier from.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return np.zeros(len(values))
+    median = np.median(values)
+    deviations = np.abs(values - median)
+    mad = np.median(deviations)
+    if mad > 0:
+        return 0.6745 * (values - median) / mad
+    mean_abs_dev = np.mean(deviations)
+    if mean_abs_dev > 0:
+        return (values - median) / (1.253314 * mean_abs_dev)
+    return np.zeros(len(values))
+
+def repeat_index(repeat):
+    digits = repeat[len('repeat'):]
+    return int(digits) if digits.isdigit() else 0
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-b', '--benchmarks', type=str, help='text file containing the list of benchmarks')
@@ -13,9 +40,21 @@ if __name__ == '__main__':
     parser.add_argument('-r','--results-dir',type=str, default='results/multi_threaded', help='results directory root (e.g. results/multi_threaded or results/single_threaded)')
     parser.add_argument('-met', '--metrics', type=str, nargs='+', help='List of metrics to calculate')
     parser.add_argument('-p', '--precision', type=int, default=0, help='Digits after the decimal point')
+    parser.add_argument('-d', '--drift-factors', type=str, default=None, help='CSV of per-run drift factors (from drift.py) to divide run times by')
+    parser.add_argument('-n', '--num-repeats', type=int, default=None, help='expected repeats per benchmark; absent ones are counted as missing (default: the repeats found)')
+    parser.add_argument('-z', '--outlier-z', type=float, default=3.5, help='samples whose robust (MAD-based) z-score exceeds this are left out of the aggregates')
+    parser.add_argument('--outlier-min-pct', type=float, default=1.0, help='samples within this percentage of the median are never outliers, whatever their z-score')
+    parser.add_argument('--rerun-list', type=str, default=None, help='write the (malloc, benchmark, repeat) of every missing, failed or outlier sample to this CSV')
     args = parser.parse_args()
 
-    metrics = {'run_time': 'seconds-elapsed', 'memory_consumption': 'max-resident-memory-kb'}
+    # only time-like metrics drift with the machine state; memory does not
+    drift_corrected_metrics = {'run_time'}
+
+    drift_factors = {}
+    if args.drift_factors:
+        drift_df = pd.read_csv(args.drift_factors)
+        for row in drift_df.itertuples(index=False):
+            drift_factors[(row.malloc, row.benchmark, row.repeat)] = float(row.drift_factor)
 
     # Load benchmark and malloc lists
     with open(args.benchmarks) as f:
@@ -30,8 +69,18 @@ if __name__ == '__main__':
                 columns_label.append(f"{malloc}_{metric}_mean")
                 columns_label.append(f"{malloc}_{metric}_median")
                 columns_label.append(f"{malloc}_{metric}_mad_pct")
+                # valid samples in the aggregates, and samples left out as outliers
+                columns_label.append(f"{malloc}_{metric}_samples")
+                columns_label.append(f"{malloc}_{metric}_outliers")
+            columns_label.append(f"{malloc}_missing_repeats")
+            columns_label.append(f"{malloc}_failed_repeats")
         res_df = pd.DataFrame(columns=columns_label)
 
+    # (malloc, benchmark, repeat) -> the reasons to measure it again
+    reruns = {}
+    def rerun(malloc, benchmark, repeat, reason):
+        reruns.setdefault((malloc, benchmark, repeat), []).append(reason)
+
     for benchmark in benchmarks:
         # reserve slot for iterations (filled after scanning all repeats/mallocs)
         results = [benchmark, None]
@@ -41,12 +90,41 @@ if __name__ == '__main__':
         results_root = args.results_dir.rstrip('/')
 
         for malloc in mallocs:
-            paths = glob.glob(f'{results_root}/{malloc}/{benchmark}/repeat*/time.csv')
+            paths = {os.path.basename(os.path.dirname(p)): p
+                     for p in glob.glob(f'{results_root}/{malloc}/{benchmark}/repeat*/time.csv')}
+            repeats = set(paths)
+            if args.num_repeats:
+                repeats |= {f'repeat{i}' for i in range(1, args.num_repeats + 1)}
             time_dfs = []
-            for p in paths:
+            time_repeats = []
+            time_drifts = []
+            missing_repeats = 0
+            failed_repeats = 0
+            for repeat in sorted(repeats, key=repeat_index):
+                p = paths.get(repeat)
+                if p is None:
+                    missing_repeats += 1
+                    rerun(malloc, benchmark, repeat, 'missing')
+                    continue
                 try:
                     df = pd.read_csv(p)
+                    # time.csv files from before kv_to_csv.py wrote a status are all ok
+                    status = str(df['status'].iloc[0]) if 'status' in df.columns else 'ok'
+                    if status != 'ok':
+                        reason = df['reason'].iloc[0] if 'reason' in df.columns else None
+                        reason = '' if pd.isna(reason) else str(reason)
+                        print(f"Warning: {status} repeat {malloc}/{benchmark}/{repeat}: {reason}", file=sys.stderr)
+                        if status == 'missing':
+                            missing_repeats += 1
+                        else:
+                            failed_repeats += 1
+                        rerun(malloc, benchmark, repeat, f"{status}: {reason}" if reason else status)
+                        continue
                     time_dfs.append(df)
+                    time_repeats.append(repeat)
+                    # a repeat measured again (--rerun_list) ran outside the campaign slot its drift factor belongs to
+                    is_rerun = 'rerun' in df.columns and float(df['rerun'].iloc[0]) == 1
+                    time_drifts.append(1.0 if is_rerun else drift_factors.get((malloc, benchmark, repeat), 1.0))
 
                     # explicit "iterations" column handling (fallback to 1)
                     if 'iterations' in df.columns:
@@ -63,26 +141,42 @@ if __name__ == '__main__':
 
                 except EmptyDataError:
                     print(f"Warning: Empty CSV file (no columns to parse): {p}", file=sys.stderr)
+                    failed_repeats += 1
+                    rerun(malloc, benchmark, repeat, 'failed: empty time.csv')
                 except Exception as e:
                     print(f"Error reading {p}: {e}", file=sys.stderr)
+                    failed_repeats += 1
+                    rerun(malloc, benchmark, repeat, 'failed: unreadable time.csv')
 
             if not time_dfs:
                 print(f"Warning: No valid time.csv files for {malloc}/{benchmark}", file=sys.stderr)
-                # append three placeholders per metric (mean, median, mad_pct)
-                results.extend([None, None, None] * len(args.metrics))
+                # append placeholders per metric (mean, median, mad_pct, samples, outliers)
+                results.extend([None, None, None, 0, 0] * len(args.metrics))
             else:
                 for metric in args.metrics:
                     try:
-                        metric_vals = [df[metrics[metric]].iloc[0] for df in time_dfs]
+                        metric_vals = np.array([float(df[METRICS[metric]].iloc[0]) for df in time_dfs])
+                        if metric in drift_corrected_metrics:
+                            metric_vals = metric_vals / np.array(time_drifts)
+                        z_scores = robust_z_scores(metric_vals)
+                        # a tight cell turns negligible differences into large z-scores
+                        median_val = np.median(metric_vals)
+                        outliers = (np.abs(z_scores) > args.outlier_z) & \
+                            (np.abs(metric_vals - median_val) > args.outlier_min_pct / 100.0 * abs(median_val))
+                        for repeat, z in zip(np.array(time_repeats)[outliers], z_scores[outliers]):
+                            print(f"Warning: outlier {metric} in {malloc}/{benchmark}/{repeat} (z = {z:.1f})", file=sys.stderr)
+                            rerun(malloc, benchmark, repeat, f"outlier: {metric} (z = {z:.1f})")
+                        metric_vals = metric_vals[~outliers]
                         mean_val = np.mean(metric_vals)
                         median_val = np.median(metric_vals)
                         mean_abs_dev = np.mean(np.abs(metric_vals - mean_val))  # Mean absolute deviation
                         mad_pct = 0.0 if mean_val == 0 else (mean_abs_dev / mean_val) * 100.0
-                        results.extend([mean_val, median_val, mad_pct])
+                        results.extend([mean_val, median_val, mad_pct, len(metric_vals), int(outliers.sum())])
                     except Exception as e:
                         print(f"Missing {metric} in {malloc}/{benchmark}: {e}", file=sys.stderr)
-                        # append three placeholders for this metric
-                        results.extend([None, None, None])
+                        # append placeholders for this metric
+                        results.extend([None, None, None, 0, 0])
+            results.extend([missing_repeats, failed_repeats])
 
         # determine iterations value for this benchmark and warn on inconsistencies
         if not iterations_set:
@@ -97,3 +191,9 @@ if __name__ == '__main__':
         res_df.loc[len(res_df)] = results
 
     res_df.to_csv(sys.stdout, index=False, float_format=f"%.{args.precision}f")
+
+    if args.rerun_list:
+        rows = [{'malloc': malloc, 'benchmark': benchmark, 'repeat': repeat, 'reason': '; '.join(reasons)}
+                for (malloc, benchmark, repeat), reasons in sorted(reruns.items(), key=lambda item: (item[0][0], item[0][1], repeat_index(item[0][2])))]
+        pd.DataFrame(rows, columns=['malloc', 'benchmark', 'repeat', 'reason']).to_csv(args.rerun_list, index=False)
+        print(f"{len(rows)} runs to measure again written to {args.rerun_list}", file=sys.stderr)
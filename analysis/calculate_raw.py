@@ -7,6 +7,8 @@ import sys, glob
 import os
 from pandas.errors import EmptyDataError
 
+from metrics import METRICS
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-b', '--benchmarks', type=str, help='text file containing the list of benchmarks')
@@ -16,7 +18,6 @@ if __name__ == '__main__':
     parser.add_argument('-p', '--precision', type=int, default=0, help='Digits after the decimal point')
     args = parser.parse_args()
 
-    metrics = {'run_time': 'seconds-elapsed', 'memory_consumption': 'max-resident-memory-kb'}
 
     # Load benchmark and malloc lists
     with open(args.benchmarks) as f:
@@ -117,7 +118,7 @@ if __name__ == '__main__':
                     continue
 
                 for metric in args.metrics:
-                    col = metrics.get(metric)
+                    col = METRICS.get(metric)
                     if col is None:
                         # Unknown metric requested; append None
                         results.append(None)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import sys
+import pandas as pd
+import numpy as np
+
+PROBE_METRIC = 'seconds-elapsed'
+
+def read_time_out(path):
+    with open(path, 'r', errors='replace') as f:
+        kv = {}
+        for row in csv.reader(f):
+            if len(row) != 2:
+                continue
+            try:
+                kv[row[0].strip()] = float(row[1])
+            except ValueError:
+                continue
+        return kv
+
+def probe_seconds(output_dir):
+    """
+    Per-iteration run time of one probe run, or NaN if it did not complete.
+    """
+    path = os.path.join(output_dir, 'time.out')
+    if not os.path.exists(path):
+        return np.nan
+    kv = read_time_out(path)
+    if PROBE_METRIC not in kv:
+        return np.nan
+    return kv[PROBE_METRIC] / kv.get('iterations', 1.0)
+
+def compute_drift_factors(campaign):
+    """
+    Each probe's factor is its run time relative to the median probe run time.
+    Every job gets the factor linearly interpolated (by its start time)
+    between the surrounding probes; jobs outside the probed span get the
+    factor of the nearest probe.
+    """
+    probes = campaign[campaign['kind'] == 'probe'].copy()
+    probes['seconds'] = [probe_seconds(d) for d in probes['output_dir']]
+    probes = probes.dropna(subset=['seconds']).sort_values('start_time')
+    if probes.empty:
+        raise ValueError('No completed probe runs were found in the campaign log.')
+    probes['drift_factor'] = probes['seconds'] / probes['seconds'].median()
+
+    jobs = campaign[(campaign['kind'] == 'run') & (campaign['returncode'] == 0)].copy()
+    jobs['drift_factor'] = np.interp(jobs['start_time'], probes['start_time'], probes['drift_factor'])
+    return probes, jobs
+
+def report_drift(probes):
+    hours = (probes['start_time'] - probes['start_time'].iloc[0]) / 3600.0
+    spread_pct = 100.0 * (probes['drift_factor'].max() - probes['drift_factor'].min())
+    print(f"probes: {len(probes)}, drift spread: {spread_pct:.2f}%", file=sys.stderr)
+    if len(probes) > 1 and hours.iloc[-1] > 0:
+        slope, _ = np.polyfit(hours, probes['drift_factor'], 1)
+        print(f"linear drift trend: {100.0 * slope:+.2f}% per hour", file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Detect run-time drift over an interleaved campaign '
+            'from its periodic reference probes and emit a per-run correction factor.')
+    parser.add_argument('-c', '--campaign', type=str, default='experiments/campaign.csv',
+            help='the campaign log written by scripts/runCampaign.py')
+    parser.add_argument('-p', '--precision', type=int, default=6, help='Digits after the decimal point')
+    args = parser.parse_args()
+
+    campaign = pd.read_csv(args.campaign)
+    # a resumed campaign may log the same job twice; the latest run wins
+    campaign = campaign.drop_duplicates(subset=['kind', 'malloc', 'benchmark', 'repeat'], keep='last')
+    probes, jobs = compute_drift_factors(campaign)
+    report_drift(probes)
+
+    jobs[['malloc', 'benchmark', 'repeat', 'drift_factor']].to_csv(
+        sys.stdout, index=False, float_format=f"%.{args.precision}f")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import sys
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+# placement statistics of the micro/placement benchmark
+PLACEMENT_BENCHMARK = 'micro/placement'
+PLACEMENT_KEYS = {'shared_line_pct': 'locality-shared-line-pct', 'shared_page_pct': 'locality-shared-page-pct',
+                  'remote_page_pct': 'locality-remote-page-pct', 'numa_nodes': 'locality-numa-nodes'}
+# throughput and first-round placement of the timed kernels
+KERNEL_BENCHMARKS = {'scratch': 'micro/cache-scratch', 'thrash': 'micro/cache-thrash'}
+KERNEL_KEYS = {'throughput': 'locality-{kernel}-mrounds-per-sec', 'shared_line_pct': 'locality-{kernel}-shared-line-pct'}
+
+def read_repeats(results_dir, malloc, benchmark):
+    """
+    The time.csv rows of all repeats of one (malloc, benchmark), or an empty frame.
+    """
+    frames = []
+    for path in sorted(glob.glob(os.path.join(results_dir, malloc, benchmark, 'repeat*', 'time.csv'))):
+        try:
+            frames.append(pd.read_csv(path))
+        except EmptyDataError:
+            print(f"Warning: empty results in {path}", file=sys.stderr)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def median_of(df, key):
+    if key not in df.columns:
+        return float('nan')
+    return pd.to_numeric(df[key], errors='coerce').median()
+
+def summarize(results_dir, mallocs):
+    """
+    One row per malloc: the median (over repeats) of every placement
+    statistic next to the kernels' throughput and first-round sharing.
+    """
+    rows = []
+    for malloc in mallocs:
+        row = {'malloc': malloc}
+        placement = read_repeats(results_dir, malloc, PLACEMENT_BENCHMARK)
+        for name, key in PLACEMENT_KEYS.items():
+            row[name] = median_of(placement, key)
+        for kernel, benchmark in KERNEL_BENCHMARKS.items():
+            runs = read_repeats(results_dir, malloc, benchmark)
+            for name, key in KERNEL_KEYS.items():
+                row[f"{kernel}_{name}"] = median_of(runs, key.format(kernel=kernel))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def correlate(summary):
+    """
+    Spearman rank correlation, across mallocs, between every placement
+    statistic and every kernel throughput.
+    """
+    throughputs = [f"{kernel}_throughput" for kernel in KERNEL_BENCHMARKS]
+    statistics = [c for c in summary.columns if c != 'malloc' and c not in throughputs]
+    rows = []
+    for statistic in statistics:
+        for throughput in throughputs:
+            # Spearman's rho is the Pearson correlation of the ranks (and needs no scipy)
+            pair = summary[[statistic, throughput]].dropna().rank()
+            # undefined for fewer than three mallocs or a statistic that does not vary
+            defined = len(pair) > 2 and pair[statistic].nunique() > 1 and pair[throughput].nunique() > 1
+            rho = pair[statistic].corr(pair[throughput]) if defined else float('nan')
+            rows.append({'statistic': statistic, 'throughput': throughput, 'mallocs': len(pair), 'spearman': rho})
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Relate the object placement of every malloc (micro/placement) '
+                                                 'to its cache-scratch and cache-thrash throughput.')
+    parser.add_argument('-m', '--mallocs', type=str, required=True, help='text file containing the list of malloc implementations')
+    parser.add_argument('-r', '--results-dir', type=str, default='results', help='results directory root')
+    parser.add_argument('-c', '--correlation', type=str, default=None,
+                        help='also write the placement/throughput rank correlations to this CSV')
+    parser.add_argument('-p', '--precision', type=int, default=3, help='Digits after the decimal point')
+    args = parser.parse_args()
+
+    with open(args.mallocs) as f:
+        mallocs = [line.strip() for line in f if line.strip()]
+
+    summary = summarize(args.results_dir.rstrip('/'), mallocs)
+    summary.round(args.precision).to_csv(sys.stdout, index=False)
+    if args.correlation:
+        correlate(summary).round(args.precision).to_csv(args.correlation, index=False)
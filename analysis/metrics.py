@@ -0,0 +1,20 @@
+# the metrics of calculate.py and calculate_raw.py: every metric name (as passed to -met)
+# and the time.out key (a time.csv column) it is read from
+
+METRICS = {'run_time': 'seconds-elapsed', 'memory_consumption': 'max-resident-memory-kb',
+           'input_resident': 'input-resident-pct',
+           # microbenchmarks/micro/startup-*
+           'startup_latency_p50': 'startup-latency-p50-us', 'startup_latency_p99': 'startup-latency-p99-us',
+           'startup_rss': 'startup-rss-p50-kb', 'startup_minor_faults': 'startup-minor-faults-p50',
+           # microbenchmarks/micro/trim-*
+           'trim_returned_free': 'trim-returned-after-free-pct', 'trim_returned_idle': 'trim-returned-after-idle-pct',
+           'trim_return_latency': 'trim-return-latency-ms', 'trim_cpu_free': 'trim-cpu-free-ms',
+           'trim_cpu_realloc': 'trim-cpu-realloc-ms', 'trim_munmap_free': 'trim-munmap-free',
+           'trim_madvise_free': 'trim-madvise-free', 'trim_madvise_idle': 'trim-madvise-idle',
+           # microbenchmarks/micro/placement and micro/cache-*
+           'locality_shared_lines': 'locality-shared-line-pct', 'locality_shared_pages': 'locality-shared-page-pct',
+           'locality_remote_pages': 'locality-remote-page-pct', 'locality_numa_nodes': 'locality-numa-nodes',
+           'locality_scratch_throughput': 'locality-scratch-mrounds-per-sec',
+           'locality_thrash_throughput': 'locality-thrash-mrounds-per-sec',
+           'locality_scratch_shared_lines': 'locality-scratch-shared-line-pct',
+           'locality_thrash_shared_lines': 'locality-thrash-shared-line-pct'}
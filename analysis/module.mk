@@ -2,9 +2,18 @@
 analysis_calculate := analysis/calculate.py
 analysis_calculate_raw := analysis/calculate_raw.py
 analysis_plot_ranked := analysis/plot.py
+analysis_drift := analysis/drift.py
+analysis_overhead := analysis/overhead.py
+analysis_report := analysis/report.py
+analysis_locality := analysis/locality.py
 
 # analysis_metrics := run_time memory_consumption
 analysis_metric := memory_consumption
+# metrics of the full report (analysis/report), one page set per metric
+analysis_report_metrics := run_time memory_consumption
+# metrics of the memory return-to-OS report (analysis/trim) over the micro/trim-* benchmarks
+analysis_trim_metrics := trim_returned_free trim_returned_idle trim_return_latency trim_cpu_free trim_cpu_realloc \
+	trim_munmap_free trim_madvise_free trim_madvise_idle
 
 ##### outputs & dirs
 # per-mode analysis directories
@@ -13,6 +22,21 @@ analysis_dir := analysis
 analysis_csv := $(analysis_dir)/summary_$(analysis_metric).csv
 analysis_raw_csv := $(analysis_dir)/summary_raw_$(analysis_metric).csv
 analysis_pdf := $(analysis_dir)/summary_$(analysis_metric).pdf
+# per-run drift factors, only available after an interleaved campaign (experiments/interleaved)
+analysis_drift_csv := $(analysis_dir)/drift_factors.csv
+# harness overhead per phase, from the events.jsonl logs of all runs
+analysis_overhead_csv := $(analysis_dir)/overhead.csv
+# multi-metric summary and the figure report built from it; the figure cache outlives analysis/clean
+analysis_report_csv := $(analysis_dir)/summary_report.csv
+analysis_report_dir := $(analysis_dir)/report
+analysis_report_cache := $(analysis_dir)/.report_cache
+analysis_trim_benchmarks := $(analysis_dir)/trim_benchmarks.txt
+analysis_trim_csv := $(analysis_dir)/summary_trim.csv
+# placement statistics and cache-scratch/thrash throughput per allocator, and their rank correlations
+analysis_locality_csv := $(analysis_dir)/summary_locality.csv
+analysis_locality_correlation_csv := $(analysis_dir)/locality_correlation.csv
+# missing, failed and outlier runs of the report metrics, to measure again with experiments/rerun
+analysis_rerun_csv := $(analysis_dir)/rerun_list.csv
 
 
 # put our ranked CSV outputs in the per-mode analysis dir when plotting
@@ -23,16 +47,63 @@ ranked_csvs := \
 	$(analysis_dir)/abs_median.csv
 
 ##### rules
-.PHONY: analysis analysis/clean
+.PHONY: FORCE analysis analysis/clean analysis/report_cache_clean analysis/drift analysis/overhead analysis/report analysis/trim analysis/locality analysis/rerun
+
+# results/ is not tracked as a prerequisite, so outputs depending on FORCE are recomputed every time
+FORCE:
 
 # Multi-threaded analysis: build CSVs and PDF under $(analysis_dir)
 analysis: $(analysis_pdf) $(analysis_raw_csv)
 
-$(analysis_csv):
+$(analysis_csv): FORCE
 	mkdir -p $(dir $@)
-	$(analysis_calculate) -b $(BENCHMARK_LIST) -met $(analysis_metric) -m $(MALLOC_LIST) -p 2 -r results/ > $@
+	$(analysis_calculate) -b $(BENCHMARK_LIST) -met $(analysis_metric) -m $(MALLOC_LIST) -n $(NUM_OF_REPEATS) -p 2 -r results/ \
+		$(if $(wildcard $(analysis_drift_csv)),-d $(analysis_drift_csv)) > $@
+
+analysis/drift: $(analysis_drift_csv)
+
+analysis/overhead: $(analysis_overhead_csv)
 
-$(analysis_raw_csv):
+# the summary is recomputed from results/ on every run; only the figures whose data changed are redrawn
+analysis/report: $(analysis_report_csv)
+	$(analysis_report) -i $< -o $(analysis_report_dir) -met $(analysis_report_metrics) --cache-dir $(analysis_report_cache)
+
+analysis/trim: $(analysis_trim_csv)
+
+$(analysis_trim_benchmarks):
+	mkdir -p $(dir $@)
+	echo $(filter micro/trim-%,$(micro_benchmarks)) | tr " " "\n" | sort > $@
+
+$(analysis_trim_csv): $(analysis_trim_benchmarks) FORCE
+	$(analysis_calculate) -b $< -met $(analysis_trim_metrics) -m $(MALLOC_LIST) -n $(NUM_OF_REPEATS) -p 2 -r results/ > $@
+
+analysis/locality: $(analysis_locality_csv)
+
+analysis/rerun: $(analysis_rerun_csv)
+
+$(analysis_rerun_csv): FORCE
+	mkdir -p $(dir $@)
+	$(analysis_calculate) -b $(BENCHMARK_LIST) -met $(analysis_report_metrics) -m $(MALLOC_LIST) -n $(NUM_OF_REPEATS) -p 2 -r results/ \
+		$(if $(wildcard $(analysis_drift_csv)),-d $(analysis_drift_csv)) --rerun-list $@ > /dev/null
+
+$(analysis_locality_csv): FORCE
+	mkdir -p $(dir $@)
+	$(analysis_locality) -m $(MALLOC_LIST) -r results/ -c $(analysis_locality_correlation_csv) > $@
+
+$(analysis_report_csv): FORCE
+	mkdir -p $(dir $@)
+	$(analysis_calculate) -b $(BENCHMARK_LIST) -met $(analysis_report_metrics) -m $(MALLOC_LIST) -n $(NUM_OF_REPEATS) -p 2 -r results/ \
+		$(if $(wildcard $(analysis_drift_csv)),-d $(analysis_drift_csv)) > $@
+
+$(analysis_overhead_csv): FORCE
+	mkdir -p $(dir $@)
+	$(analysis_overhead) -e $(EXPERIMENTS_ROOT) $(if $(wildcard $(CAMPAIGN_LOG)),-c $(CAMPAIGN_LOG)) > $@
+
+$(analysis_drift_csv): $(CAMPAIGN_LOG)
+	mkdir -p $(dir $@)
+	$(analysis_drift) -c $< > $@
+
+$(analysis_raw_csv): FORCE
 	mkdir -p $(dir $@)
 	$(analysis_calculate_raw) -b $(BENCHMARK_LIST) -met $(analysis_metric) -m $(MALLOC_LIST) -p 2 -r results/ > $@
 
@@ -41,4 +112,10 @@ $(analysis_pdf): $(analysis_csv)
 	$(analysis_plot_ranked) -i $< -o $@ --csv-dir $(analysis_dir)
 
 analysis/clean:
-	rm -f $(analysis_csv) $(analysis_pdf) $(ranked_csvs) $(analysis_raw_csv)
+	rm -f $(analysis_csv) $(analysis_pdf) $(ranked_csvs) $(analysis_raw_csv) $(analysis_drift_csv) $(analysis_overhead_csv) $(analysis_report_csv) \
+		$(analysis_trim_benchmarks) $(analysis_trim_csv) $(analysis_locality_csv) $(analysis_locality_correlation_csv) \
+		$(analysis_rerun_csv) $(analysis_rerun_csv).done
+	rm -rf $(analysis_report_dir)
+
+analysis/report_cache_clean:
+	rm -rf $(analysis_report_cache)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import pandas as pd
+
+BENCHMARK_PHASE = 'benchmark'
+
+def read_events(path):
+    with open(path, 'r', errors='replace') as f:
+        events = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Warning: malformed event in {path}: {line}", file=sys.stderr)
+        return events
+
+def split_run(events):
+    """
+    Split the events of one benchmark run into seconds per phase.
+    Iterations are split into the benchmark itself (seconds-elapsed) and
+    the launch overhead around it. The gaps between the events, from the
+    start of copytree to the end of the last event, are accounted as
+    'untracked'.
+    """
+    seconds = {}
+    def add(phase, value):
+        seconds[phase] = seconds.get(phase, 0.0) + value
+    for event in events:
+        if event['phase'] == 'iteration':
+            benchmark_seconds = min(event.get('benchmark_seconds', 0.0), event['duration'])
+            add(BENCHMARK_PHASE, benchmark_seconds)
+            add('launch', event['duration'] - benchmark_seconds)
+        else:
+            add(event['phase'], event['duration'])
+    span = max(e['end'] for e in events) - min(e['start'] for e in events)
+    add('untracked', max(span - sum(seconds.values()), 0.0))
+    return seconds, span
+
+def campaign_seconds(campaign_log, events_by_run):
+    """
+    The wall time of the whole campaign: from the start of its first run to
+    the end of its last one in campaign.csv (wall-clock timestamps), or else
+    from the first to the last event of all runs. The event timestamps are
+    monotonic, so the latter holds for the runs of one host and one boot.
+    """
+    if campaign_log is not None:
+        campaign = pd.read_csv(campaign_log)
+        if not campaign.empty:
+            return campaign['end_time'].max() - campaign['start_time'].min()
+    starts = [min(e['start'] for e in events) for events in events_by_run]
+    ends = [max(e['end'] for e in events) for events in events_by_run]
+    return max(ends) - min(starts)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the harness overhead of a campaign '
+            'from the events.jsonl logs written by scripts/runBenchmark.py.')
+    parser.add_argument('-e', '--experiments-dir', type=str, default='experiments',
+            help='root directory to search for events.jsonl files')
+    parser.add_argument('-c', '--campaign-log', type=str, default=None,
+            help='campaign.csv of an interleaved campaign, whose wall-clock span is the campaign wall time '
+            '(default: from the first to the last event)')
+    parser.add_argument('-p', '--precision', type=int, default=2, help='Digits after the decimal point')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.experiments_dir, '**', 'events.jsonl'), recursive=True))
+    if not paths:
+        sys.exit(f"Error: no events.jsonl files found under {args.experiments_dir}")
+
+    totals = {}
+    events_by_run = []
+    span_seconds = 0.0
+    bytes_copied = 0
+    bytes_deleted = 0
+    runs = 0
+    for path in paths:
+        events = read_events(path)
+        if not events:
+            continue
+        seconds, span = split_run(events)
+        for phase, value in seconds.items():
+            totals[phase] = totals.get(phase, 0.0) + value
+        span_seconds += span
+        events_by_run.append(events)
+        bytes_copied += sum(e.get('bytes_copied', 0) for e in events)
+        bytes_deleted += sum(e.get('bytes_deleted', 0) for e in events)
+        runs += 1
+
+    if not events_by_run:
+        sys.exit(f"Error: no events found under {args.experiments_dir}")
+    # the time outside every run: interpreter and launcher startup, the make and campaign
+    # drivers, and idle time; runs of parallel workers overlap, leaving no gap
+    wall_seconds = max(campaign_seconds(args.campaign_log, events_by_run), span_seconds)
+    totals['between_runs'] = wall_seconds - span_seconds
+
+    summary = pd.DataFrame({'phase': list(totals.keys()), 'seconds': list(totals.values())})
+    summary['fraction_pct'] = 100.0 * summary['seconds'] / wall_seconds
+    summary = summary.sort_values('seconds', ascending=False)
+
+    overhead_seconds = wall_seconds - totals.get(BENCHMARK_PHASE, 0.0)
+    print(f"runs: {runs}, campaign wall time: {wall_seconds:.1f}s, summed run spans: {span_seconds:.1f}s, "
+          f"overhead: {overhead_seconds:.1f}s ({100.0 * overhead_seconds / wall_seconds:.1f}%)", file=sys.stderr)
+    print(f"bytes copied: {bytes_copied}, bytes deleted: {bytes_deleted}", file=sys.stderr)
+
+    summary.to_csv(sys.stdout, index=False, float_format=f"%.{args.precision}f")
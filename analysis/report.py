@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import re
+import argparse
+import hashlib
+import shutil
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+import matplotlib.pyplot as plt
+import numpy as np
+
+from plot import (BENCHMARK_COL, PREFERRED_ALLOC_ORDER, THINGS_TO_COMPARE,
+                  parse_columns, prepare_precent_differences, compute_yerr_from_mad_pct_in_csv)
+
+# bump whenever the drawing code changes so cached figures are redrawn
+RENDER_VERSION = 2
+
+FACET_COLUMNS = 3
+
+
+# ---------------- Input ----------------
+def discover_metrics(columns):
+    """
+    Metric names of summary columns named "<malloc>_<metric>_<thing>".
+    """
+    things = '|'.join(THINGS_TO_COMPARE)
+    metrics = []
+    for col in columns:
+        m = re.match(rf'^[^_]+_(.+)_({things})$', col)
+        if m and m.group(1) not in metrics:
+            metrics.append(m.group(1))
+    return metrics
+
+
+def metric_frame(df, metric):
+    """
+    The benchmark column plus the columns of a single metric.
+    """
+    cols = [c for c in df.columns if re.match(rf'^[^_]+_{re.escape(metric)}_', c)]
+    return df[[BENCHMARK_COL] + cols]
+
+
+def suite_of(benchmark):
+    return benchmark.split('/')[0]
+
+
+def order_allocators(allocs):
+    preferred = [a for a in PREFERRED_ALLOC_ORDER if a in allocs]
+    return preferred + sorted(a for a in allocs if a not in preferred)
+
+
+# ---------------- Figure specs ----------------
+def build_specs(df, metric, eps_factor, eps_floor):
+    """
+    One spec per figure: (name, kind, title, frames). frames holds the exact
+    data the figure is drawn from, so it is also what the cache key hashes.
+    """
+    mdf = metric_frame(df, metric)
+    colmap = parse_columns(mdf.columns, THINGS_TO_COMPARE)
+    diffs = prepare_precent_differences(mdf, colmap, THINGS_TO_COMPARE,
+                                        eps_factor=eps_factor, eps_floor=eps_floor)
+    yerr = compute_yerr_from_mad_pct_in_csv(mdf, colmap).get('mean')
+
+    specs = []
+    for thing, frame in diffs.items():
+        frame = frame[order_allocators(list(frame.columns))]
+        specs.append((f"{metric}/{thing}", 'ranked', f"{metric}: {thing} % diff vs glibc",
+                      {'diffs': frame, 'yerr': yerr if thing == 'mean' else None}))
+
+    med = diffs.get('median')
+    if med is not None:
+        med = med[order_allocators(list(med.columns))]
+        specs.append((f"{metric}/abs_median", 'ranked', f"{metric}: median % diff vs glibc (absolute)",
+                      {'diffs': med.abs(), 'yerr': None}))
+
+    mean = diffs.get('mean')
+    # an empty summary has no suites to facet
+    if mean is not None and not mean.empty:
+        mean = mean[order_allocators(list(mean.columns))]
+        specs.append((f"{metric}/suites", 'facets', f"{metric}: mean % diff vs glibc per suite",
+                      {'diffs': mean, 'yerr': yerr}))
+        # one page per allocator, so adding an allocator leaves the others cached
+        for alloc in mean.columns:
+            specs.append((f"{metric}/allocators/{alloc}", 'facets',
+                          f"{metric}: {alloc} mean % diff vs glibc per suite",
+                          {'diffs': mean[[alloc]],
+                           'yerr': yerr[[alloc]] if yerr is not None and alloc in yerr.columns else None}))
+    return specs
+
+
+def spec_key(spec):
+    name, kind, title, frames = spec
+    h = hashlib.sha256()
+    h.update(f"{RENDER_VERSION}\0{kind}\0{title}\0".encode())
+    for key in sorted(frames):
+        frame = frames[key]
+        h.update(key.encode())
+        h.update(b'\0' if frame is None else frame.to_csv(float_format='%.12g').encode())
+    return h.hexdigest()
+
+
+# ---------------- Rendering ----------------
+# every time the colormap wraps, the lines get the next marker, so no two allocators look the same
+_WRAP_MARKERS = [None, 'o', 's', '^', 'D', 'v', 'x', '+']
+
+
+def _styles(n):
+    cmap = plt.get_cmap('tab10' if n <= 10 else 'tab20')
+    return [(cmap(i % cmap.N), _WRAP_MARKERS[(i // cmap.N) % len(_WRAP_MARKERS)]) for i in range(n)]
+
+
+def _draw_ranked(ax, df, yerr=None):
+    for (color, marker), col in zip(_styles(len(df.columns)), df.columns):
+        s = df[col].dropna().sort_values()
+        if s.empty:
+            continue
+        x = np.arange(1, len(s) + 1)
+        ax.plot(x, s.values, label=col, color=color, linewidth=1.8, zorder=3,
+                marker=marker, markersize=4, markevery=max(1, len(s) // 10))
+        if yerr is not None and col in yerr.columns:
+            e = np.nan_to_num(yerr[col].reindex(s.index).values, nan=0.0)
+            ax.errorbar(x, s.values, yerr=e, fmt='none', ecolor=color,
+                        elinewidth=1.0, capsize=3, alpha=0.9, zorder=2)
+        ax.axhline(s.mean(), linestyle="--", linewidth=1, color=color, alpha=0.7, zorder=1)
+    ax.set_xlabel("Rank (sorted per line)")
+    ax.set_ylabel("% diff vs glibc")
+
+
+def render_figure(kind, title, frames, output_pdf):
+    """
+    Draw one figure into output_pdf; runs inside a worker process.
+    """
+    diffs, yerr = frames['diffs'], frames['yerr']
+    if kind == 'ranked':
+        fig, ax = plt.subplots(figsize=(10, 6))
+        _draw_ranked(ax, diffs, yerr)
+        ax.set_title(title)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend()
+    else:
+        suites = sorted(set(suite_of(b) for b in diffs.index))
+        ncols = min(FACET_COLUMNS, len(suites))
+        nrows = math.ceil(len(suites) / ncols)
+        fig, axes = plt.subplots(nrows, ncols, figsize=(5 * ncols, 4 * nrows), squeeze=False)
+        for ax, suite in zip(axes.flat, suites):
+            rows = [b for b in diffs.index if suite_of(b) == suite]
+            _draw_ranked(ax, diffs.loc[rows], None if yerr is None else yerr.reindex(rows))
+            ax.set_title(suite)
+        for ax in list(axes.flat)[len(suites):]:
+            ax.set_visible(False)
+        handles, labels = axes.flat[0].get_legend_handles_labels()
+        fig.legend(handles, labels, loc='upper right')
+        fig.suptitle(title)
+    fig.tight_layout()
+    # render next to the final name and rename, so an interrupted run never leaves a broken cache entry
+    tmp_pdf = f"{output_pdf}.{os.getpid()}.tmp"
+    fig.savefig(tmp_pdf, format='pdf')
+    plt.close(fig)
+    os.replace(tmp_pdf, output_pdf)
+    return output_pdf
+
+
+def merge_pdfs(pdfs, output_pdf):
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        print("Warning: pypdf is not installed; skipping the merged report PDF", file=sys.stderr)
+        return
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(str(pdf))
+    with open(output_pdf, 'wb') as f:
+        writer.write(f)
+
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Build a figure report for every metric, suite and allocator "
+                                                 "of summary CSVs, rendering in parallel and caching by input data.")
+    parser.add_argument("-i", "--input", nargs='+', required=True, help="summary CSVs (from calculate.py)")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory to write the figures to")
+    parser.add_argument("-met", "--metrics", nargs='+', default=None,
+                        help="metrics to report (default: every metric found in the inputs)")
+    parser.add_argument("--cache-dir", default=None, help="figure cache (default: <output-dir>/.cache)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of rendering processes")
+    parser.add_argument("--merged-pdf", default=None, help="also merge all figures into this PDF (needs pypdf)")
+    parser.add_argument("--eps-factor", type=float, default=0.5, help="Row-wise epsilon factor (default 0.5)")
+    parser.add_argument("--eps-floor", type=float, default=None, help="Absolute epsilon floor (default: machine eps)")
+    args = parser.parse_args()
+
+    out_dir = Path(args.output_dir)
+    cache_dir = Path(args.cache_dir) if args.cache_dir else out_dir / '.cache'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    specs = []
+    for path in args.input:
+        df = pd.read_csv(path)
+        for metric in (args.metrics or discover_metrics(df.columns)):
+            specs += build_specs(df, metric, args.eps_factor, args.eps_floor)
+
+    keyed = [(spec, cache_dir / f"{spec_key(spec)}.pdf") for spec in specs]
+    missing = {}
+    for spec, cached in keyed:
+        if not cached.exists():
+            missing[cached] = spec
+    print(f"figures: {len(keyed)}, cached: {len(keyed) - len(missing)}, rendering: {len(missing)}", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(render_figure, spec[1], spec[2], spec[3], str(cached))
+                   for cached, spec in missing.items()]
+        for future in futures:
+            future.result()
+
+    outputs = []
+    manifest = []
+    for spec, cached in keyed:
+        target = out_dir / f"{spec[0]}.pdf"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, target)
+        outputs.append(target)
+        manifest.append({'figure': spec[0], 'key': cached.stem, 'rendered': cached in missing})
+    pd.DataFrame(manifest).to_csv(out_dir / 'manifest.csv', index=False)
+
+    if args.merged_pdf:
+        merge_pdfs(outputs, args.merged_pdf)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,12 +12,16 @@ RUN_BENCHMARK := $(SCRIPTS_ROOT_DIR)/runBenchmark.py
 MEASURE_METRICS := $(SCRIPTS_ROOT_DIR)/measureMetrics.sh
 RUN_MALLOC_TOOL := $(SCRIPTS_ROOT_DIR)/runMalloc.py
 SET_CPU_MEMORY_AFFINITY := $(SCRIPTS_ROOT_DIR)/setCpuMemoryAffinity.sh
+RUN_CAMPAIGN := $(SCRIPTS_ROOT_DIR)/runCampaign.py
+WORK_QUEUE := $(SCRIPTS_ROOT_DIR)/workQueue.py
 
 ###### global constants
 export EXPERIMENTS_ROOT := $(ROOT_DIR)/$(MODULE_NAME)
 export EXPERIMENTS_TEMPLATE := $(EXPERIMENTS_ROOT)/template.mk
 NUMBER_OF_SOCKETS := $(shell ls -d /sys/devices/system/node/node*/ | wc -w)
 export BOUND_MEMORY_NODE := $$(( $(NUMBER_OF_SOCKETS) - 1 ))
+# iteration counts calibrated once per (benchmark, threads, input) and reused by every malloc and repeat
+export CALIBRATION_CACHE_DIR := $(EXPERIMENTS_ROOT)/calibration_cache
 
 # define configuration_array
 # $(addprefix configuration,$(shell seq 1 $1))
@@ -34,10 +38,20 @@ export BOUND_MEMORY_NODE := $$(( $(NUMBER_OF_SOCKETS) - 1 ))
 # include $(ROOT_DIR)/common.mk
 .PHONY: experiments-prerequisites
 
-experiments-prerequisites: mallocs
+experiments-prerequisites: mallocs microbenchmarks
 
 
-$(MODULE_NAME): $(BENCHMARK_LIST) $(SUBMODULES)
+$(MODULE_NAME): $(BENCHMARK_LIST) $(MODULE_NAME)/calibration $(SUBMODULES)
+
+##### calibration
+# the first repeat of the baseline malloc calibrates the iteration count of every benchmark (and is
+# kept as a regular sample); all the other measurements wait for it and reuse the cached count.
+CALIBRATION_MALLOC ?= ptmalloc2
+CALIBRATION_MEASUREMENTS := $(if $(filter $(CALIBRATION_MALLOC),$(MALLOC_VERSIONS)), \
+	$(addprefix $(MODULE_NAME)/$(CALIBRATION_MALLOC)/,$(addsuffix /repeat1/time.out,$(benchmarks))))
+
+.PHONY: $(MODULE_NAME)/calibration
+$(MODULE_NAME)/calibration: $(CALIBRATION_MEASUREMENTS)
 
 SUBMAKEFILES := $(addsuffix /module.mk,$(SUBMODULES))
 
@@ -49,7 +63,57 @@ $(MODULE_NAME)/%/module.mk: $(MODULE_NAME)/template.mk
 $(BENCHMARK_LIST): $(MODULE_NAME)/module.mk
 	echo $(benchmarks) | tr " " "\n" | sort > $@
 
+##### interleaved campaign
+# runs every (malloc, benchmark, repeat) in randomized blocks instead of one malloc after the other.
+# set CAMPAIGN_SEED to reproduce an order, and PROBE_BENCHMARK to a short benchmark for the drift probe.
+CAMPAIGN_LOG := $(MODULE_NAME)/campaign.csv
+PROBE_BENCHMARK ?= $(firstword $(benchmarks))
+# {malloc} and {library} are substituted by the campaign script for every run
+SUBMIT_TEMPLATE := $(MEASURE_METRICS) $(SET_CPU_MEMORY_AFFINITY) $(BOUND_MEMORY_NODE) \
+	$(RUN_MALLOC_TOOL) --library {library}
+
+.PHONY: $(MODULE_NAME)/interleaved
+$(MODULE_NAME)/interleaved: experiments-prerequisites $(BENCHMARK_LIST)
+	$(RUN_CAMPAIGN) -m $(MALLOC_LIST) -b $(BENCHMARK_LIST) -r $(NUM_OF_REPEATS) \
+		$(if $(CAMPAIGN_SEED),--seed $(CAMPAIGN_SEED)) \
+		$(if $(PROBE_BENCHMARK),--probe_benchmark $(PROBE_BENCHMARK)) \
+		--benchmarks_root $(benchmarks_root) $(MICROBENCHMARKS_ROOT) --lib_dir $(ROOT_DIR)/$(MALLOC_LIB_DIR) \
+		--submit_template "$(SUBMIT_TEMPLATE)" -c $(CALIBRATION_CACHE_DIR) -e $(MODULE_NAME)
+
+##### work queue
+# shards a campaign over any number of hosts sharing QUEUE_DIR: queue-init once, queue-work on
+# every host (QUEUE_WORKERS workers each), and queue-merge to build experiments/ and results/.
+QUEUE_DIR ?= $(MODULE_NAME)/queue
+QUEUE_WORKERS ?= 1
+
+.PHONY: $(MODULE_NAME)/queue-init $(MODULE_NAME)/queue-work $(MODULE_NAME)/queue-merge $(MODULE_NAME)/queue-status
+$(MODULE_NAME)/queue-init: experiments-prerequisites $(BENCHMARK_LIST)
+	$(WORK_QUEUE) init $(QUEUE_DIR) -m $(MALLOC_LIST) -b $(BENCHMARK_LIST) -r $(NUM_OF_REPEATS) \
+		--benchmarks_root $(benchmarks_root) $(MICROBENCHMARKS_ROOT) --lib_dir $(ROOT_DIR)/$(MALLOC_LIB_DIR) \
+		--submit_template "$(SUBMIT_TEMPLATE)" --calibration_malloc $(CALIBRATION_MALLOC)
+
+$(MODULE_NAME)/queue-work: experiments-prerequisites
+	$(WORK_QUEUE) work $(QUEUE_DIR) -j $(QUEUE_WORKERS)
+
+$(MODULE_NAME)/queue-merge:
+	$(WORK_QUEUE) merge $(QUEUE_DIR) -e $(MODULE_NAME) -r results
+
+$(MODULE_NAME)/queue-status:
+	$(WORK_QUEUE) status $(QUEUE_DIR)
+
+##### reruns
+# measures the runs of RERUN_LIST (default: analysis/rerun_list.csv, from make analysis/rerun) again;
+# the rejected outputs are kept next to the new ones as <repeat>.rejected, and "make results" rebuilds their CSVs
+RERUN_LIST ?= analysis/rerun_list.csv
+
+.PHONY: $(MODULE_NAME)/rerun
+$(MODULE_NAME)/rerun: experiments-prerequisites
+	$(RUN_BENCHMARK) --rerun_list $(RERUN_LIST) \
+		--benchmarks_root $(benchmarks_root) $(MICROBENCHMARKS_ROOT) --lib_dir $(ROOT_DIR)/$(MALLOC_LIB_DIR) \
+		--submit_template "$(SUBMIT_TEMPLATE)" -c $(CALIBRATION_CACHE_DIR) -e $(MODULE_NAME) -r results
+
 $(MODULE_NAME)/clean: $(addsuffix /clean,$(SUBMODULES))
-	rm -rf $(SUBMODULES)
+	rm -rf $(SUBMODULES) $(MODULE_NAME)/probes $(CAMPAIGN_LOG) $(MODULE_NAME)/queue \
+		$(CALIBRATION_CACHE_DIR)
 
 -include $(SUBMAKEFILES)
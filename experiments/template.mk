@@ -17,8 +17,14 @@ $(EXPERIMENT_REPEATS): %: %/time.out
 $(MEASUREMENTS): experiments-prerequisites
 	echo ========== [INFO] start MALLOC_VERSION ==========
 	benchmark=$$(echo $(dir $@) | cut -d/ -f3-4); \
+	benchmark_root=$(benchmarks_root); \
+	case $$benchmark in micro/*) benchmark_root=$(MICROBENCHMARKS_ROOT);; esac; \
 	$(RUN_BENCHMARK) --submit_command "$(MEASURE_METRICS) $(SET_CPU_MEMORY_AFFINITY) $(BOUND_MEMORY_NODE) \
-		$(RUN_MALLOC_TOOL) --library $(MALLOC_VERSION_TOOL)" -- $(benchmarks_root)/$$benchmark $(dir $@)
+		$(RUN_MALLOC_TOOL) --library $(MALLOC_VERSION_TOOL)" \
+		-x placement.csv.gz -- $$benchmark_root/$$benchmark $(dir $@)
+
+# every other measurement waits for the calibration runs of the baseline malloc
+$(filter-out $(CALIBRATION_MEASUREMENTS),$(MEASUREMENTS)): | $(CALIBRATION_MEASUREMENTS)
 
 DELETED_TARGETS := $(EXPERIMENTS) $(EXPERIMENT_REPEATS)
 CLEAN_TARGETS := $(addsuffix /clean,$(DELETED_TARGETS))
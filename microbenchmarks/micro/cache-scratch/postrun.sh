@@ -0,0 +1,6 @@
+#! /bin/bash
+set -e
+
+# append the placement statistics (and the kernel timing) of the last iteration to time.out,
+# so they flow into results/ like any other metric
+cat locality.out >> time.out
@@ -0,0 +1,8 @@
+#! /bin/bash
+set -e
+
+# every thread frees an object allocated next to the other threads' ones by the main thread, then
+# allocates, writes and frees LOCALITY_ROUNDS objects of LOCALITY_OBJECT_SIZE bytes,
+# writing every byte LOCALITY_WRITES times
+./bin/locality -k scratch -t ${LOCALITY_THREADS:-${OMP_NUM_THREADS:-4}} -s ${LOCALITY_OBJECT_SIZE:-8} \
+    -r ${LOCALITY_ROUNDS:-1000000} -W ${LOCALITY_WRITES:-100} -o locality.out
@@ -0,0 +1,3 @@
+#! /bin/bash
+
+rm -f locality.out
@@ -0,0 +1,7 @@
+#! /bin/bash
+set -e
+
+# every thread allocates, writes and frees LOCALITY_ROUNDS objects of LOCALITY_OBJECT_SIZE bytes,
+# writing every byte LOCALITY_WRITES times
+./bin/locality -k thrash -t ${LOCALITY_THREADS:-${OMP_NUM_THREADS:-4}} -s ${LOCALITY_OBJECT_SIZE:-8} \
+    -r ${LOCALITY_ROUNDS:-1000000} -W ${LOCALITY_WRITES:-100} -o locality.out
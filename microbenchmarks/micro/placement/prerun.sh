@@ -0,0 +1,3 @@
+#! /bin/bash
+
+rm -f locality.out placement.csv placement.csv.gz
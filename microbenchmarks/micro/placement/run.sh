@@ -0,0 +1,7 @@
+#! /bin/bash
+set -e
+
+# every thread allocates LOCALITY_OBJECTS objects of LOCALITY_OBJECT_SIZE bytes concurrently;
+# the addresses are written to placement.csv (the placement map, compressed by postrun.sh) when LOCALITY_MAP is 1
+./bin/locality -k placement -t ${LOCALITY_THREADS:-${OMP_NUM_THREADS:-4}} -s ${LOCALITY_OBJECT_SIZE:-8} \
+    -n ${LOCALITY_OBJECTS:-32768} -o locality.out $([[ ${LOCALITY_MAP:-1} != 0 ]] && echo -l placement.csv)
@@ -0,0 +1,7 @@
+#! /bin/bash
+set -e
+
+# summarize the samples of all iterations (p50/p99 latency, RSS, minor faults)
+# and append them to time.out, so they flow into results/ like any other metric
+./bin/spawn_bench -S startup_samples.csv -o startup.out
+cat startup.out >> time.out
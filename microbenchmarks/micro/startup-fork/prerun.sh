@@ -0,0 +1,4 @@
+#! /bin/bash
+
+# start every run from an empty sample set
+rm -f startup_samples.csv
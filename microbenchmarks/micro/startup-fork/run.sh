@@ -0,0 +1,5 @@
+#! /bin/bash
+
+# launch many tiny processes with fork+execv; they inherit LD_PRELOAD from the submit command,
+# so every launch pays for loading and initializing the allocator under test
+./bin/spawn_bench -m fork -n ${STARTUP_PROCESSES:-2000} -s startup_samples.csv ./bin/tiny
@@ -0,0 +1,5 @@
+#! /bin/bash
+
+# append the per-phase RSS and CPU cost of the last iteration to time.out, and count the
+# syscalls per phase in a second, traced run outside the measured time (see bin/trim.sh)
+./bin/trim.sh postrun large
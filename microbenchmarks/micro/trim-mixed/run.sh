@@ -0,0 +1,4 @@
+#! /bin/bash
+
+# allocate a working set of mixed blocks, free most of it, idle, and reallocate (see bin/trim.sh)
+./bin/trim.sh run mixed
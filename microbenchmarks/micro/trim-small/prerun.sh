@@ -0,0 +1,3 @@
+#! /bin/bash
+
+rm -f trim.out rss.csv phases.csv syscalls.out syscalls.trace
@@ -0,0 +1,4 @@
+#! /bin/bash
+
+# allocate a working set of small blocks, free most of it, idle, and reallocate (see bin/trim.sh)
+./bin/trim.sh run small
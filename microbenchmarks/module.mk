@@ -0,0 +1,47 @@
+##### microbenchmarks/module.mk
+
+MICRO_ROOT_DIR  := microbenchmarks
+MICRO_SRC_DIR   := $(MICRO_ROOT_DIR)/src
+MICRO_BUILD_DIR := $(MICRO_ROOT_DIR)/build
+# the benchmarks root of the in-repo benchmarks, which live under its micro/ suite
+export MICROBENCHMARKS_ROOT := $(ROOT_DIR)/$(MICRO_ROOT_DIR)
+
+MICRO_CFLAGS := -O2 -Wall -Wextra -pthread
+MICRO_LDLIBS := -lm
+
+# every program is built once and copied into the bin/ of each benchmark using it,
+# because runBenchmark.py copies the benchmark directory before running it
+MICRO_PROGRAMS := spawn_bench tiny phased count_syscalls.sh trim.sh locality
+micro_programs_startup-fork := spawn_bench tiny
+micro_programs_startup-spawn := spawn_bench tiny
+micro_programs_trim-small := phased count_syscalls.sh trim.sh
+micro_programs_trim-large := phased count_syscalls.sh trim.sh
+micro_programs_trim-mixed := phased count_syscalls.sh trim.sh
+micro_programs_placement := locality
+micro_programs_cache-scratch := locality
+micro_programs_cache-thrash := locality
+
+MICRO_BINARIES := $(foreach bench,$(notdir $(micro_benchmarks)), \
+	$(addprefix $(MICRO_ROOT_DIR)/micro/$(bench)/bin/,$(micro_programs_$(bench))))
+
+.PHONY: microbenchmarks microbenchmarks/clean
+microbenchmarks: $(MICRO_BINARIES)
+
+$(MICRO_BUILD_DIR)/%: $(MICRO_SRC_DIR)/%.c | $(MICRO_BUILD_DIR)
+	$(CC) $(MICRO_CFLAGS) -o $@ $< $(MICRO_LDLIBS)
+
+$(MICRO_BUILD_DIR)/%.sh: $(MICRO_SRC_DIR)/%.sh | $(MICRO_BUILD_DIR)
+	cp $< $@
+
+$(MICRO_BUILD_DIR):
+	mkdir -p $@
+
+define micro_copy_rule
+$(filter %/bin/$(1),$(MICRO_BINARIES)): $(MICRO_BUILD_DIR)/$(1)
+	mkdir -p $$(dir $$@)
+	cp $$< $$@
+endef
+$(foreach program,$(MICRO_PROGRAMS),$(eval $(call micro_copy_rule,$(program))))
+
+microbenchmarks/clean:
+	rm -rf $(MICRO_BUILD_DIR) $(MICRO_BINARIES)
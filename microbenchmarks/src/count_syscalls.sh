@@ -0,0 +1,31 @@
+#! /bin/bash
+
+# Usage: count_syscalls.sh phases.csv syscalls.trace
+# counts the munmap, madvise and brk calls of an "strace -f -ttt" trace per phase,
+# where phases.csv holds "phase,start,end" lines in epoch seconds, and prints
+# them as "trim-<syscall>-<phase>,<count>" lines (the time.out format)
+
+if (( $# < 2 )); then
+    echo "Usage: $0 phases.csv syscalls.trace"
+    exit -1
+fi
+
+awk -F, '
+    NR == FNR { name[NR] = $1; start[NR] = $2; end[NR] = $3; phases = NR; next }
+    {
+        # "<pid> <epoch> <syscall>(...)"; "<... resumed>" halves are not counted twice
+        split($0, fields, " ")
+        call = fields[3]
+        sub(/\(.*/, "", call)
+        if (call != "munmap" && call != "madvise" && call != "brk")
+            next
+        for (i = 1; i <= phases; i++)
+            if (fields[2] >= start[i] && fields[2] < end[i])
+                count[call "-" name[i]]++
+    }
+    END {
+        split("munmap madvise brk", calls, " ")
+        for (c = 1; c <= 3; c++)
+            for (i = 1; i <= phases; i++)
+                printf "trim-%s-%s,%d\n", calls[c], name[i], count[calls[c] "-" name[i]]
+    }' "$1" "$2"
@@ -0,0 +1,364 @@
+/*
+ * locality: how an allocator places the objects of different threads, and
+ * what that placement costs in cache-scratch and cache-thrash kernels.
+ *
+ *   locality -k placement [-t threads] [-s size] [-n objects] -o locality.out [-l placement.csv]
+ *       every thread allocates (and first-touches) objects of the given
+ *       size concurrently with the others; the addresses are analyzed for
+ *       cache lines and pages shared by several threads, and the NUMA node
+ *       of every page is queried with move_pages.
+ *
+ *   locality -k scratch|thrash [-t threads] [-s size] [-r rounds] [-W writes] -o locality.out
+ *       times the cache-scratch (passive false sharing: every thread first
+ *       frees an object the main thread allocated next to the others') or
+ *       the cache-thrash (active false sharing) kernel: every thread
+ *       repeatedly allocates an object, writes every byte of it, and frees it.
+ *       The objects of the first round stay allocated and are analyzed like
+ *       the placement ones.
+ *
+ * The summary is written as key,value lines (the time.out format) and the
+ * placement map as "thread,address,size,node" lines.
+ */
+#define _GNU_SOURCE
+#include <pthread.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+
+#define CACHE_LINE 64
+
+enum kernel { KERNEL_PLACEMENT, KERNEL_SCRATCH, KERNEL_THRASH };
+
+static enum kernel kernel = KERNEL_PLACEMENT;
+static int num_threads = 4;
+static size_t object_size = 8;
+static long num_objects = 32768;
+static long rounds = 1000000;
+static long writes = 100;
+
+static pthread_barrier_t barrier;
+static char **handoff;
+
+/* one allocated object, as seen by the placement analysis */
+struct record {
+    uintptr_t address;
+    int thread;
+    int thread_node;
+};
+
+struct thread_state {
+    int id;
+    int node;
+    struct record *records;
+    long num_records;
+};
+
+/* a cache line or page and the thread that has an object on it */
+struct owner {
+    uintptr_t unit;
+    int thread;
+};
+
+static double now(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+static int current_node(void)
+{
+    unsigned cpu, node;
+    if (syscall(SYS_getcpu, &cpu, &node, NULL) != 0)
+        return -1;
+    return node;
+}
+
+static void *xmalloc(size_t size)
+{
+    void *p = malloc(size);
+    if (p == NULL) {
+        perror("malloc");
+        exit(1);
+    }
+    return p;
+}
+
+/* write every byte of the object, repeatedly, like the Hoard cache-scratch/thrash benchmarks */
+static void write_object(char *p)
+{
+    volatile char *v = p;
+    for (long w = 0; w < writes; w++)
+        for (size_t j = 0; j < object_size; j++)
+            v[j]++;
+}
+
+static void *placement_worker(void *arg)
+{
+    struct thread_state *ts = arg;
+
+    ts->records = xmalloc(num_objects * sizeof(*ts->records));
+    pthread_barrier_wait(&barrier);
+    ts->node = current_node();
+    for (long i = 0; i < num_objects; i++) {
+        char *p = xmalloc(object_size);
+        /* first touch, so the page is placed on this thread's node */
+        memset(p, ts->id + 1, object_size);
+        ts->records[i] = (struct record){ (uintptr_t)p, ts->id, ts->node };
+    }
+    ts->num_records = num_objects;
+    /* the objects stay allocated until the analysis is done */
+    pthread_barrier_wait(&barrier);
+    pthread_barrier_wait(&barrier);
+    for (long i = 0; i < num_objects; i++)
+        free((void *)ts->records[i].address);
+    return NULL;
+}
+
+static void *kernel_worker(void *arg)
+{
+    struct thread_state *ts = arg;
+
+    ts->records = xmalloc(sizeof(*ts->records));
+    ts->node = current_node();
+    pthread_barrier_wait(&barrier);
+    if (kernel == KERNEL_SCRATCH) {
+        /* the object next to the other threads' ones goes back to this thread's heap */
+        write_object(handoff[ts->id]);
+        free(handoff[ts->id]);
+    }
+    for (long r = 0; r < rounds; r++) {
+        char *p = xmalloc(object_size);
+        write_object(p);
+        if (r == 0) {
+            /* the first-round object stays allocated until the analysis is done */
+            ts->records[0] = (struct record){ (uintptr_t)p, ts->id, ts->node };
+            ts->num_records = 1;
+            continue;
+        }
+        free(p);
+    }
+    pthread_barrier_wait(&barrier);
+    pthread_barrier_wait(&barrier);
+    if (ts->num_records)
+        free((void *)ts->records[0].address);
+    return NULL;
+}
+
+static int cmp_owner(const void *a, const void *b)
+{
+    const struct owner *x = a, *y = b;
+    if (x->unit != y->unit)
+        return x->unit < y->unit ? -1 : 1;
+    return x->thread - y->thread;
+}
+
+/*
+ * The share (in %) of the units (cache lines or pages, of 2^shift bytes)
+ * holding objects of more than one thread; *units is set to their number.
+ */
+static double shared_pct(struct record *records, long n, int shift, long *units)
+{
+    long cap = n, count = 0, shared = 0;
+    struct owner *owners = xmalloc(cap * sizeof(*owners));
+
+    for (long i = 0; i < n; i++) {
+        uintptr_t first = records[i].address >> shift;
+        uintptr_t last = (records[i].address + object_size - 1) >> shift;
+        for (uintptr_t unit = first; unit <= last; unit++) {
+            if (count == cap) {
+                cap *= 2;
+                owners = realloc(owners, cap * sizeof(*owners));
+            }
+            owners[count++] = (struct owner){ unit, records[i].thread };
+        }
+    }
+    qsort(owners, count, sizeof(*owners), cmp_owner);
+    *units = 0;
+    for (long i = 0; i < count;) {
+        long j = i + 1;
+        int threads = 1;
+        for (; j < count && owners[j].unit == owners[i].unit; j++)
+            if (owners[j].thread != owners[j - 1].thread)
+                threads++;
+        (*units)++;
+        if (threads > 1)
+            shared++;
+        i = j;
+    }
+    free(owners);
+    return *units ? 100.0 * shared / *units : 0;
+}
+
+static int cmp_address(const void *a, const void *b)
+{
+    const struct record *x = a, *y = b;
+    return (x->address > y->address) - (x->address < y->address);
+}
+
+/*
+ * Query the NUMA node of every page holding an object (move_pages without
+ * target nodes only reports them) and fill nodes[] per record; returns the
+ * share of pages on another node than the one of the thread that first
+ * touched them, and sets *num_nodes to the number of distinct nodes.
+ */
+static double remote_pct(struct record *records, long n, int *nodes, int *num_nodes)
+{
+    long page_size = sysconf(_SC_PAGESIZE), num_pages = 0, remote = 0, queried = 0;
+    void **pages = xmalloc(n * sizeof(void *));
+    int *status = xmalloc(n * sizeof(int));
+    long *first = xmalloc(n * sizeof(long));
+    uint64_t seen = 0;
+
+    /* the records are sorted by address, so the objects of a page are adjacent */
+    for (long i = 0; i < n; i++) {
+        void *page = (void *)(records[i].address & ~(uintptr_t)(page_size - 1));
+        if (num_pages == 0 || pages[num_pages - 1] != page) {
+            first[num_pages] = i;
+            pages[num_pages++] = page;
+        }
+    }
+    if (syscall(SYS_move_pages, 0, num_pages, pages, NULL, status, 0) != 0) {
+        perror("move_pages");
+        for (long p = 0; p < num_pages; p++)
+            status[p] = -1;
+    }
+    for (long p = 0, i = 0; p < num_pages; p++) {
+        long end = p + 1 < num_pages ? first[p + 1] : n;
+        for (; i < end; i++)
+            nodes[i] = status[p] >= 0 ? status[p] : -1;
+        if (status[p] < 0)
+            continue;
+        queried++;
+        if (status[p] < 64)
+            seen |= 1ULL << status[p];
+        if (records[first[p]].thread_node >= 0 && status[p] != records[first[p]].thread_node)
+            remote++;
+    }
+    *num_nodes = __builtin_popcountll(seen);
+    free(pages);
+    free(status);
+    free(first);
+    return queried ? 100.0 * remote / queried : 0;
+}
+
+static void usage(const char *prog)
+{
+    fprintf(stderr, "Usage: %s -k placement [-t threads] [-s size] [-n objects] -o locality.out [-l placement.csv]\n"
+                    "       %s -k scratch|thrash [-t threads] [-s size] [-r rounds] [-W writes] -o locality.out\n",
+            prog, prog);
+    exit(2);
+}
+
+int main(int argc, char **argv)
+{
+    const char *out_path = NULL, *map_path = NULL, *prefix;
+    struct thread_state *states;
+    struct record *records;
+    pthread_t *threads;
+    double start, seconds;
+    long n = 0, lines, pages;
+    int opt, num_nodes, *nodes;
+    FILE *out;
+
+    while ((opt = getopt(argc, argv, "k:t:s:n:r:W:o:l:")) != -1) {
+        switch (opt) {
+        case 'k':
+            if (strcmp(optarg, "placement") == 0)
+                kernel = KERNEL_PLACEMENT;
+            else if (strcmp(optarg, "scratch") == 0)
+                kernel = KERNEL_SCRATCH;
+            else if (strcmp(optarg, "thrash") == 0)
+                kernel = KERNEL_THRASH;
+            else
+                usage(argv[0]);
+            break;
+        case 't': num_threads = atoi(optarg); break;
+        case 's': object_size = strtoul(optarg, NULL, 10); break;
+        case 'n': num_objects = atol(optarg); break;
+        case 'r': rounds = atol(optarg); break;
+        case 'W': writes = atol(optarg); break;
+        case 'o': out_path = optarg; break;
+        case 'l': map_path = optarg; break;
+        default: usage(argv[0]);
+        }
+    }
+    if (out_path == NULL || num_threads < 1 || object_size < 1 || num_objects < 1 || rounds < 1)
+        usage(argv[0]);
+
+    states = calloc(num_threads, sizeof(*states));
+    threads = calloc(num_threads, sizeof(*threads));
+    pthread_barrier_init(&barrier, NULL, num_threads + 1);
+    if (kernel == KERNEL_SCRATCH) {
+        /* allocated back to back by one thread, so they likely share cache lines */
+        handoff = xmalloc(num_threads * sizeof(char *));
+        for (int i = 0; i < num_threads; i++)
+            handoff[i] = xmalloc(object_size);
+    }
+    for (int i = 0; i < num_threads; i++) {
+        states[i].id = i;
+        pthread_create(&threads[i], NULL, kernel == KERNEL_PLACEMENT ? placement_worker : kernel_worker, &states[i]);
+    }
+    pthread_barrier_wait(&barrier);
+    start = now();
+    pthread_barrier_wait(&barrier);
+    seconds = now() - start;
+
+    /* gather the records while the objects are still allocated */
+    for (int i = 0; i < num_threads; i++)
+        n += states[i].num_records;
+    records = xmalloc(n * sizeof(*records));
+    n = 0;
+    for (int i = 0; i < num_threads; i++) {
+        memcpy(records + n, states[i].records, states[i].num_records * sizeof(*records));
+        n += states[i].num_records;
+    }
+    qsort(records, n, sizeof(*records), cmp_address);
+    nodes = xmalloc(n * sizeof(int));
+    double line_pct = shared_pct(records, n, __builtin_ctzl(CACHE_LINE), &lines);
+    double page_pct = shared_pct(records, n, __builtin_ctzl(sysconf(_SC_PAGESIZE)), &pages);
+    double remote = remote_pct(records, n, nodes, &num_nodes);
+
+    pthread_barrier_wait(&barrier);
+    for (int i = 0; i < num_threads; i++) {
+        pthread_join(threads[i], NULL);
+        free(states[i].records);
+    }
+
+    out = fopen(out_path, "w");
+    if (out == NULL) {
+        perror(out_path);
+        return 1;
+    }
+    /* the placement statistics are unprefixed; the kernels' ones describe their first-round objects */
+    prefix = kernel == KERNEL_PLACEMENT ? "locality" : kernel == KERNEL_SCRATCH ? "locality-scratch" : "locality-thrash";
+    fprintf(out, "%s-threads,%d\n", prefix, num_threads);
+    fprintf(out, "%s-object-size,%zu\n", prefix, object_size);
+    fprintf(out, "%s-objects,%ld\n", prefix, n);
+    fprintf(out, "%s-cache-lines,%ld\n", prefix, lines);
+    fprintf(out, "%s-shared-line-pct,%.3f\n", prefix, line_pct);
+    fprintf(out, "%s-pages,%ld\n", prefix, pages);
+    fprintf(out, "%s-shared-page-pct,%.3f\n", prefix, page_pct);
+    fprintf(out, "%s-numa-nodes,%d\n", prefix, num_nodes);
+    fprintf(out, "%s-remote-page-pct,%.3f\n", prefix, remote);
+    if (kernel == KERNEL_PLACEMENT) {
+        fprintf(out, "locality-alloc-ms,%.3f\n", 1e3 * seconds);
+    } else {
+        fprintf(out, "%s-seconds,%.6f\n", prefix, seconds);
+        fprintf(out, "%s-mrounds-per-sec,%.3f\n", prefix, num_threads * rounds / seconds / 1e6);
+    }
+    fclose(out);
+
+    if (map_path != NULL && (out = fopen(map_path, "w")) != NULL) {
+        fprintf(out, "thread,address,size,node\n");
+        for (long i = 0; i < n; i++)
+            fprintf(out, "%d,0x%lx,%zu,%d\n", records[i].thread, (unsigned long)records[i].address,
+                    object_size, nodes[i]);
+        fclose(out);
+    }
+    return 0;
+}
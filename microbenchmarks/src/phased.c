@@ -0,0 +1,360 @@
+/*
+ * phased: a phased workload that measures how an allocator returns memory
+ * to the OS. Every thread allocates (and touches) its share of a working
+ * set, frees a random subset of it, the process idles, and then the freed
+ * blocks are allocated again:
+ *
+ *   alloc -> free -> idle -> realloc
+ *
+ * A sampler thread records the RSS over time, and the CPU time of every
+ * phase is taken from getrusage. The summary is written as key,value lines
+ * (the time.out format); the RSS timeline and the phase boundaries (in
+ * epoch seconds, to match "strace -ttt") are written as CSVs.
+ *
+ *   phased [-t threads] [-w working_set_mb] [-m small|medium|large|mixed]
+ *          [-f free_pct] [-i idle_seconds] [-r sample_ms]
+ *          -o trim.out [-l rss.csv] [-p phases.csv]
+ */
+#define _GNU_SOURCE
+#include <pthread.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+
+enum phase { PHASE_START, PHASE_ALLOC, PHASE_FREE, PHASE_IDLE, PHASE_REALLOC, NUM_PHASES };
+static const char *phase_names[NUM_PHASES] = { "start", "alloc", "free", "idle", "realloc" };
+/* below this share of the working set returned by the end of idle, the return latency is undefined (nan) */
+#define MIN_RETURNED_PCT 1.0
+
+struct size_class {
+    size_t min, max;
+    int weight;
+};
+
+/* the size mixes: small blocks, medium blocks, blocks above the usual mmap thresholds, and a blend */
+static const struct size_class small_mix[] = { { 16, 256, 1 } };
+static const struct size_class medium_mix[] = { { 1024, 64 * 1024, 1 } };
+static const struct size_class large_mix[] = { { 128 * 1024, 1024 * 1024, 1 } };
+static const struct size_class mixed_mix[] = { { 16, 256, 80 }, { 1024, 64 * 1024, 15 }, { 128 * 1024, 1024 * 1024, 5 } };
+
+static const struct size_class *mix;
+static int mix_len;
+
+static int num_threads = 4;
+static size_t working_set = 256UL << 20;
+static int free_pct = 90;
+static double idle_seconds = 5.0;
+static long sample_ms = 50;
+
+static pthread_barrier_t barrier;
+static volatile int current_phase = PHASE_START;
+static volatile int sampling = 1;
+
+struct rss_sample {
+    double t;
+    int phase;
+    long rss_kb;
+};
+
+static struct rss_sample *samples;
+static long num_samples, samples_cap;
+static pthread_mutex_t samples_lock = PTHREAD_MUTEX_INITIALIZER;
+
+struct thread_state {
+    int id;
+    uint64_t rng;
+    void **blocks;
+    size_t *sizes;
+    long num_blocks;
+    char *freed;
+};
+
+static double now(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+static double epoch_now(void)
+{
+    struct timeval tv;
+    gettimeofday(&tv, NULL);
+    return tv.tv_sec + tv.tv_usec / 1e6;
+}
+
+static double cpu_seconds(void)
+{
+    struct rusage ru;
+    getrusage(RUSAGE_SELF, &ru);
+    return ru.ru_utime.tv_sec + ru.ru_utime.tv_usec / 1e6 + ru.ru_stime.tv_sec + ru.ru_stime.tv_usec / 1e6;
+}
+
+static long rss_kb(void)
+{
+    long size, resident = 0;
+    FILE *f = fopen("/proc/self/statm", "r");
+    if (f == NULL)
+        return -1;
+    if (fscanf(f, "%ld %ld", &size, &resident) != 2)
+        resident = 0;
+    fclose(f);
+    return resident * (sysconf(_SC_PAGESIZE) / 1024);
+}
+
+static uint64_t xorshift(uint64_t *state)
+{
+    uint64_t x = *state;
+    x ^= x << 13;
+    x ^= x >> 7;
+    x ^= x << 17;
+    return *state = x;
+}
+
+static size_t random_size(uint64_t *rng)
+{
+    int total = 0, pick;
+    for (int i = 0; i < mix_len; i++)
+        total += mix[i].weight;
+    pick = xorshift(rng) % total;
+    for (int i = 0; i < mix_len; i++) {
+        if (pick < mix[i].weight)
+            return mix[i].min + xorshift(rng) % (mix[i].max - mix[i].min + 1);
+        pick -= mix[i].weight;
+    }
+    return mix[0].min;
+}
+
+static void *allocate(struct thread_state *ts, long i)
+{
+    void *p = malloc(ts->sizes[i]);
+    if (p == NULL) {
+        perror("malloc");
+        exit(1);
+    }
+    /* touch every byte so the whole block is resident */
+    memset(p, ts->id + 1, ts->sizes[i]);
+    return p;
+}
+
+static void *worker(void *arg)
+{
+    struct thread_state *ts = arg;
+    size_t share = working_set / num_threads, allocated = 0;
+    long cap = 1024;
+
+    ts->blocks = malloc(cap * sizeof(void *));
+    ts->sizes = malloc(cap * sizeof(size_t));
+
+    /* alloc */
+    pthread_barrier_wait(&barrier);
+    while (allocated < share) {
+        if (ts->num_blocks == cap) {
+            cap *= 2;
+            ts->blocks = realloc(ts->blocks, cap * sizeof(void *));
+            ts->sizes = realloc(ts->sizes, cap * sizeof(size_t));
+        }
+        ts->sizes[ts->num_blocks] = random_size(&ts->rng);
+        ts->blocks[ts->num_blocks] = allocate(ts, ts->num_blocks);
+        allocated += ts->sizes[ts->num_blocks];
+        ts->num_blocks++;
+    }
+    ts->freed = calloc(ts->num_blocks, 1);
+    pthread_barrier_wait(&barrier);
+
+    /* free a random subset, so the survivors are scattered over the heap */
+    pthread_barrier_wait(&barrier);
+    for (long i = 0; i < ts->num_blocks; i++) {
+        if ((long)(xorshift(&ts->rng) % 100) < free_pct) {
+            free(ts->blocks[i]);
+            ts->freed[i] = 1;
+        }
+    }
+    pthread_barrier_wait(&barrier);
+
+    /* idle: the main thread sleeps between these two barriers */
+    pthread_barrier_wait(&barrier);
+    pthread_barrier_wait(&barrier);
+
+    /* realloc */
+    pthread_barrier_wait(&barrier);
+    for (long i = 0; i < ts->num_blocks; i++)
+        if (ts->freed[i])
+            ts->blocks[i] = allocate(ts, i);
+    pthread_barrier_wait(&barrier);
+
+    for (long i = 0; i < ts->num_blocks; i++)
+        free(ts->blocks[i]);
+    free(ts->blocks);
+    free(ts->sizes);
+    free(ts->freed);
+    return NULL;
+}
+
+static void add_sample(double t, int phase, long rss)
+{
+    pthread_mutex_lock(&samples_lock);
+    if (num_samples == samples_cap) {
+        samples_cap = samples_cap ? samples_cap * 2 : 1024;
+        samples = realloc(samples, samples_cap * sizeof(*samples));
+    }
+    samples[num_samples++] = (struct rss_sample){ t, phase, rss };
+    pthread_mutex_unlock(&samples_lock);
+}
+
+static void *sampler(void *arg)
+{
+    double start = *(double *)arg;
+    struct timespec interval = { sample_ms / 1000, (sample_ms % 1000) * 1000000L };
+
+    while (sampling) {
+        add_sample(now() - start, current_phase, rss_kb());
+        nanosleep(&interval, NULL);
+    }
+    return NULL;
+}
+
+static void parse_mix(const char *name)
+{
+#define SET_MIX(m) do { mix = m; mix_len = sizeof(m) / sizeof(m[0]); } while (0)
+    if (strcmp(name, "small") == 0)
+        SET_MIX(small_mix);
+    else if (strcmp(name, "medium") == 0)
+        SET_MIX(medium_mix);
+    else if (strcmp(name, "large") == 0)
+        SET_MIX(large_mix);
+    else if (strcmp(name, "mixed") == 0)
+        SET_MIX(mixed_mix);
+    else {
+        fprintf(stderr, "unknown size mix: %s\n", name);
+        exit(2);
+    }
+#undef SET_MIX
+}
+
+static void usage(const char *prog)
+{
+    fprintf(stderr, "Usage: %s [-t threads] [-w working_set_mb] [-m small|medium|large|mixed] [-f free_pct]\n"
+                    "          [-i idle_seconds] [-r sample_ms] -o trim.out [-l rss.csv] [-p phases.csv]\n", prog);
+    exit(2);
+}
+
+int main(int argc, char **argv)
+{
+    const char *out_path = NULL, *timeline_path = NULL, *phases_path = NULL;
+    double wall[NUM_PHASES + 1], cpu[NUM_PHASES + 1], epoch[NUM_PHASES + 1];
+    long rss_at[NUM_PHASES + 1];
+    struct thread_state *states;
+    pthread_t *threads, sampler_thread;
+    double start;
+    int opt;
+    FILE *out;
+
+    parse_mix("mixed");
+    while ((opt = getopt(argc, argv, "t:w:m:f:i:r:o:l:p:")) != -1) {
+        switch (opt) {
+        case 't': num_threads = atoi(optarg); break;
+        case 'w': working_set = strtoul(optarg, NULL, 10) << 20; break;
+        case 'm': parse_mix(optarg); break;
+        case 'f': free_pct = atoi(optarg); break;
+        case 'i': idle_seconds = atof(optarg); break;
+        case 'r': sample_ms = atol(optarg); break;
+        case 'o': out_path = optarg; break;
+        case 'l': timeline_path = optarg; break;
+        case 'p': phases_path = optarg; break;
+        default: usage(argv[0]);
+        }
+    }
+    if (out_path == NULL || num_threads < 1 || sample_ms < 1)
+        usage(argv[0]);
+
+    states = calloc(num_threads, sizeof(*states));
+    threads = calloc(num_threads, sizeof(*threads));
+    pthread_barrier_init(&barrier, NULL, num_threads + 1);
+
+    start = now();
+    pthread_create(&sampler_thread, NULL, sampler, &start);
+    for (int i = 0; i < num_threads; i++) {
+        states[i].id = i;
+        states[i].rng = 0x9E3779B97F4A7C15ULL * (i + 1);
+        pthread_create(&threads[i], NULL, worker, &states[i]);
+    }
+
+    /* boundary p is the start of phase p; boundary NUM_PHASES is the end of the last phase */
+    for (int p = PHASE_ALLOC; p <= NUM_PHASES; p++) {
+        if (p > PHASE_ALLOC)
+            pthread_barrier_wait(&barrier);
+        wall[p] = now() - start;
+        cpu[p] = cpu_seconds();
+        epoch[p] = epoch_now();
+        rss_at[p] = rss_kb();
+        add_sample(wall[p], p < NUM_PHASES ? p : PHASE_REALLOC, rss_at[p]);
+        if (p == NUM_PHASES)
+            break;
+        current_phase = p;
+        pthread_barrier_wait(&barrier);
+        if (p == PHASE_IDLE) {
+            struct timespec idle = { (time_t)idle_seconds, (long)((idle_seconds - (time_t)idle_seconds) * 1e9) };
+            nanosleep(&idle, NULL);
+        }
+    }
+    for (int i = 0; i < num_threads; i++)
+        pthread_join(threads[i], NULL);
+    sampling = 0;
+    pthread_join(sampler_thread, NULL);
+
+    /* how much of the working set (above the starting RSS) is returned by the end of the idle phase */
+    long base = rss_at[PHASE_ALLOC], peak = rss_at[PHASE_FREE], after_idle = rss_at[PHASE_REALLOC];
+    double span = peak > base ? (double)(peak - base) : 1.0;
+    double returned_pct = 100.0 * (peak - rss_at[PHASE_IDLE]) / span;
+    double returned_idle_pct = 100.0 * (peak - after_idle) / span;
+    /* time from the start of the free phase until the RSS settles within 5% of the span of its idle-end value */
+    double settled = -1;
+    for (long i = 0; i < num_samples; i++) {
+        if (samples[i].t < wall[PHASE_FREE] || samples[i].t > wall[PHASE_REALLOC])
+            continue;
+        if (samples[i].rss_kb - after_idle > 0.05 * span)
+            settled = -1;
+        else if (settled < 0)
+            settled = samples[i].t;
+    }
+    double return_latency = (settled < 0 ? wall[PHASE_REALLOC] : settled) - wall[PHASE_FREE];
+    /* an RSS that is never returned "settles" right away; that is no latency at all, not the best one */
+    if (returned_idle_pct < MIN_RETURNED_PCT)
+        return_latency = NAN;
+
+    out = fopen(out_path, "w");
+    if (out == NULL) {
+        perror(out_path);
+        return 1;
+    }
+    fprintf(out, "trim-threads,%d\n", num_threads);
+    for (int p = PHASE_ALLOC; p < NUM_PHASES; p++) {
+        fprintf(out, "trim-rss-%s-end-kb,%ld\n", phase_names[p], rss_at[p + 1]);
+        fprintf(out, "trim-wall-%s-ms,%.3f\n", phase_names[p], 1e3 * (wall[p + 1] - wall[p]));
+        fprintf(out, "trim-cpu-%s-ms,%.3f\n", phase_names[p], 1e3 * (cpu[p + 1] - cpu[p]));
+    }
+    fprintf(out, "trim-returned-after-free-pct,%.3f\n", returned_pct);
+    fprintf(out, "trim-returned-after-idle-pct,%.3f\n", returned_idle_pct);
+    fprintf(out, "trim-return-latency-ms,%.3f\n", 1e3 * return_latency);
+    fclose(out);
+
+    if (timeline_path != NULL && (out = fopen(timeline_path, "w")) != NULL) {
+        fprintf(out, "seconds,phase,rss_kb\n");
+        for (long i = 0; i < num_samples; i++)
+            fprintf(out, "%.3f,%s,%ld\n", samples[i].t, phase_names[samples[i].phase], samples[i].rss_kb);
+        fclose(out);
+    }
+    if (phases_path != NULL && (out = fopen(phases_path, "w")) != NULL) {
+        for (int p = PHASE_ALLOC; p < NUM_PHASES; p++)
+            fprintf(out, "%s,%.6f,%.6f\n", phase_names[p], epoch[p], epoch[p + 1]);
+        fclose(out);
+    }
+    return 0;
+}
@@ -0,0 +1,277 @@
+/*
+ * spawn_bench: launch many short-lived processes and record, per process,
+ * the launch-to-exit latency, the peak RSS and the minor page faults.
+ *
+ *   spawn_bench -m fork|spawn [-n count] [-w warmup] -s samples.csv program [args...]
+ *       launches the program count times (after warmup untimed launches)
+ *       with fork+execv or posix_spawn, inheriting the environment (and
+ *       thus LD_PRELOAD), and appends one "latency_us,rss_kb,minor_faults"
+ *       line per launch to samples.csv. The peak RSS is the one the program
+ *       writes to descriptor REPORT_FD (see tiny.c): the ru_maxrss of a
+ *       forked child carries the parent's RSS at fork time across execve.
+ *
+ *   spawn_bench -S samples.csv -o startup.out
+ *       summarizes all the samples into key,value lines (the time.out format).
+ */
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <math.h>
+#include <spawn.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+
+extern char **environ;
+
+/* the descriptor the launched program reports its own peak RSS on */
+#define REPORT_FD 3
+
+struct sample {
+    double latency_us;
+    long rss_kb;
+    long minor_faults;
+};
+
+static double now_us(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec * 1e6 + ts.tv_nsec / 1e3;
+}
+
+/* a close-on-exec pipe whose write end is not REPORT_FD, so dup2 onto REPORT_FD clears close-on-exec */
+static int report_pipe(int fds[2])
+{
+    if (pipe2(fds, O_CLOEXEC) != 0) {
+        perror("pipe2");
+        return -1;
+    }
+    if (fds[1] == REPORT_FD) {
+        int fd = fcntl(fds[1], F_DUPFD_CLOEXEC, REPORT_FD + 1);
+        close(fds[1]);
+        fds[1] = fd;
+    }
+    return 0;
+}
+
+/* the peak RSS reported by the program, or -1 if it reported none */
+static long read_report(int fd)
+{
+    char buf[32];
+    ssize_t len = read(fd, buf, sizeof(buf) - 1);
+
+    if (len <= 0)
+        return -1;
+    buf[len] = '\0';
+    return atol(buf);
+}
+
+/* returns 0 on success and fills the sample, -1 on a failed launch */
+static int launch(int use_spawn, char **argv, struct sample *s)
+{
+    struct rusage ru;
+    int status, fds[2];
+    pid_t pid;
+    double start = now_us();
+
+    if (report_pipe(fds) != 0)
+        return -1;
+    if (use_spawn) {
+        posix_spawn_file_actions_t actions;
+        int err;
+
+        posix_spawn_file_actions_init(&actions);
+        posix_spawn_file_actions_adddup2(&actions, fds[1], REPORT_FD);
+        err = posix_spawn(&pid, argv[0], &actions, NULL, argv, environ);
+        posix_spawn_file_actions_destroy(&actions);
+        if (err != 0) {
+            fprintf(stderr, "posix_spawn %s: %s\n", argv[0], strerror(err));
+            close(fds[0]);
+            close(fds[1]);
+            return -1;
+        }
+    } else {
+        pid = fork();
+        if (pid < 0) {
+            perror("fork");
+            close(fds[0]);
+            close(fds[1]);
+            return -1;
+        }
+        if (pid == 0) {
+            if (dup2(fds[1], REPORT_FD) < 0)
+                _exit(127);
+            execv(argv[0], argv);
+            _exit(127);
+        }
+    }
+    close(fds[1]);
+    if (wait4(pid, &status, 0, &ru) < 0) {
+        perror("wait4");
+        close(fds[0]);
+        return -1;
+    }
+    s->latency_us = now_us() - start;
+    s->rss_kb = read_report(fds[0]);
+    s->minor_faults = ru.ru_minflt;
+    close(fds[0]);
+    if (!WIFEXITED(status) || WEXITSTATUS(status) != 0) {
+        fprintf(stderr, "%s exited abnormally (status %d)\n", argv[0], status);
+        return -1;
+    }
+    if (s->rss_kb < 0) {
+        fprintf(stderr, "%s reported no peak RSS on descriptor %d\n", argv[0], REPORT_FD);
+        return -1;
+    }
+    return 0;
+}
+
+static int run(int use_spawn, long count, long warmup, const char *samples_path, char **argv)
+{
+    struct sample s;
+    long failures = 0;
+    FILE *out = fopen(samples_path, "a");
+
+    if (out == NULL) {
+        perror(samples_path);
+        return 1;
+    }
+    for (long i = 0; i < warmup; i++)
+        if (launch(use_spawn, argv, &s) != 0)
+            failures++;
+    for (long i = 0; i < count; i++) {
+        if (launch(use_spawn, argv, &s) != 0) {
+            failures++;
+            continue;
+        }
+        fprintf(out, "%.3f,%ld,%ld\n", s.latency_us, s.rss_kb, s.minor_faults);
+    }
+    fclose(out);
+    if (failures > 0) {
+        fprintf(stderr, "%ld launches failed\n", failures);
+        return 1;
+    }
+    return 0;
+}
+
+static int cmp_double(const void *a, const void *b)
+{
+    double x = *(const double *)a, y = *(const double *)b;
+    return (x > y) - (x < y);
+}
+
+/* nearest-rank percentile of a sorted array */
+static double percentile(const double *sorted, long n, double p)
+{
+    long rank = (long)ceil(p / 100.0 * n);
+    if (rank < 1)
+        rank = 1;
+    return sorted[rank - 1];
+}
+
+static double mean(const double *v, long n)
+{
+    double sum = 0;
+    for (long i = 0; i < n; i++)
+        sum += v[i];
+    return sum / n;
+}
+
+static int summarize(const char *samples_path, const char *out_path)
+{
+    long n = 0, cap = 4096;
+    double *latency = malloc(cap * sizeof(double));
+    double *rss = malloc(cap * sizeof(double));
+    double *faults = malloc(cap * sizeof(double));
+    struct sample s;
+    FILE *in = fopen(samples_path, "r");
+    FILE *out;
+
+    if (in == NULL) {
+        perror(samples_path);
+        return 1;
+    }
+    while (fscanf(in, "%lf,%ld,%ld", &s.latency_us, &s.rss_kb, &s.minor_faults) == 3) {
+        if (n == cap) {
+            cap *= 2;
+            latency = realloc(latency, cap * sizeof(double));
+            rss = realloc(rss, cap * sizeof(double));
+            faults = realloc(faults, cap * sizeof(double));
+        }
+        latency[n] = s.latency_us;
+        rss[n] = s.rss_kb;
+        faults[n] = s.minor_faults;
+        n++;
+    }
+    fclose(in);
+    if (n == 0) {
+        fprintf(stderr, "no samples in %s\n", samples_path);
+        return 1;
+    }
+    qsort(latency, n, sizeof(double), cmp_double);
+    qsort(rss, n, sizeof(double), cmp_double);
+    qsort(faults, n, sizeof(double), cmp_double);
+
+    out = fopen(out_path, "w");
+    if (out == NULL) {
+        perror(out_path);
+        return 1;
+    }
+    fprintf(out, "startup-processes,%ld\n", n);
+    fprintf(out, "startup-latency-mean-us,%.3f\n", mean(latency, n));
+    fprintf(out, "startup-latency-p50-us,%.3f\n", percentile(latency, n, 50));
+    fprintf(out, "startup-latency-p99-us,%.3f\n", percentile(latency, n, 99));
+    fprintf(out, "startup-latency-max-us,%.3f\n", latency[n - 1]);
+    fprintf(out, "startup-rss-p50-kb,%.0f\n", percentile(rss, n, 50));
+    fprintf(out, "startup-rss-max-kb,%.0f\n", rss[n - 1]);
+    fprintf(out, "startup-minor-faults-mean,%.3f\n", mean(faults, n));
+    fprintf(out, "startup-minor-faults-p50,%.0f\n", percentile(faults, n, 50));
+    fclose(out);
+    free(latency);
+    free(rss);
+    free(faults);
+    return 0;
+}
+
+static void usage(const char *prog)
+{
+    fprintf(stderr, "Usage: %s -m fork|spawn [-n count] [-w warmup] -s samples.csv program [args...]\n"
+                    "       %s -S samples.csv -o startup.out\n", prog, prog);
+    exit(2);
+}
+
+int main(int argc, char **argv)
+{
+    const char *mode = NULL, *samples_path = NULL, *summary_path = NULL, *out_path = NULL;
+    long count = 2000, warmup = 20;
+    int opt;
+
+    /* '+' stops at the first non-option, so the program's own args are kept */
+    while ((opt = getopt(argc, argv, "+m:n:w:s:S:o:")) != -1) {
+        switch (opt) {
+        case 'm': mode = optarg; break;
+        case 'n': count = atol(optarg); break;
+        case 'w': warmup = atol(optarg); break;
+        case 's': samples_path = optarg; break;
+        case 'S': summary_path = optarg; break;
+        case 'o': out_path = optarg; break;
+        default: usage(argv[0]);
+        }
+    }
+    if (summary_path != NULL) {
+        if (out_path == NULL)
+            usage(argv[0]);
+        return summarize(summary_path, out_path);
+    }
+    if (mode == NULL || samples_path == NULL || optind >= argc)
+        usage(argv[0]);
+    if (strcmp(mode, "fork") != 0 && strcmp(mode, "spawn") != 0)
+        usage(argv[0]);
+    return run(strcmp(mode, "spawn") == 0, count, warmup, samples_path, &argv[optind]);
+}
@@ -0,0 +1,64 @@
+/*
+ * A tiny short-lived process: it initializes the (preloaded) allocator,
+ * touches a handful of small and medium blocks, and exits. Launched
+ * thousands of times by spawn_bench to measure allocator startup costs.
+ *
+ * Just before exiting, it writes its own peak RSS (VmHWM, in kB) to the
+ * report descriptor (REPORT_FD) if spawn_bench opened one: unlike the
+ * ru_maxrss of wait4, VmHWM belongs to the exec'd image only, so it does
+ * not include the RSS of a forking parent.
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <fcntl.h>
+#include <unistd.h>
+
+#define NUM_BLOCKS 16
+#define REPORT_FD 3
+
+static long peak_rss_kb(void)
+{
+    char line[256];
+    long kb = -1;
+    FILE *f = fopen("/proc/self/status", "r");
+
+    if (f == NULL)
+        return -1;
+    while (fgets(line, sizeof(line), f) != NULL)
+        if (sscanf(line, "VmHWM: %ld kB", &kb) == 1)
+            break;
+    fclose(f);
+    return kb;
+}
+
+static void report(void)
+{
+    char buf[32];
+    int len;
+
+    if (fcntl(REPORT_FD, F_GETFD) < 0)
+        return;
+    len = snprintf(buf, sizeof(buf), "%ld\n", peak_rss_kb());
+    if (write(REPORT_FD, buf, len) != len)
+        exit(1);
+}
+
+int main(void)
+{
+    void *blocks[NUM_BLOCKS];
+    size_t size = 16;
+
+    for (int i = 0; i < NUM_BLOCKS; i++) {
+        blocks[i] = malloc(size);
+        if (blocks[i] == NULL)
+            return 1;
+        /* first-touch the pages, like a real tool filling its buffers */
+        memset(blocks[i], i, size);
+        size *= 2;
+    }
+    for (int i = NUM_BLOCKS - 1; i >= 0; i--)
+        free(blocks[i]);
+    report();
+    return 0;
+}
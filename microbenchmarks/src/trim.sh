@@ -0,0 +1,47 @@
+#! /bin/bash
+
+# Usage: trim.sh run|postrun small|large|mixed
+# the run.sh and postrun.sh of the micro/trim-* benchmarks, which differ only in the size mix:
+#   run      allocates a working set, frees most of it, idles, and reallocates (the measured run)
+#   postrun  appends the per-phase results of the last iteration to time.out, and counts
+#            munmap/madvise/brk per phase in a second, traced run outside the measured time
+# TRIM_* override the defaults, and the thread count follows OMP_NUM_THREADS
+set -e
+
+if (( $# < 2 )); then
+    echo "Usage: $0 run|postrun small|large|mixed"
+    exit -1
+fi
+
+mix=$2
+phased_args="-t ${TRIM_THREADS:-${OMP_NUM_THREADS:-4}} -m $mix -w ${TRIM_WORKING_SET_MB:-512} \
+    -f ${TRIM_FREE_PCT:-90} -i ${TRIM_IDLE_SECONDS:-5} -r ${TRIM_SAMPLE_MS:-50}"
+
+case $1 in
+run)
+    ./bin/phased $phased_args -o trim.out -l rss.csv
+    ;;
+postrun)
+    cat trim.out >> time.out
+    if [[ ${TRIM_TRACE_SYSCALLS:-1} != 0 ]] && command -v strace > /dev/null; then
+        strace -f -ttt -qq -e trace=munmap,madvise,brk -o syscalls.trace \
+            ./bin/phased $phased_args -o /dev/null -p phases.csv
+        ./bin/count_syscalls.sh phases.csv syscalls.trace >> time.out
+        rm -f syscalls.trace
+    else
+        if [[ ${TRIM_TRACE_SYSCALLS:-1} != 0 ]]; then
+            echo "Warning: strace is not installed, the trim-<syscall>-<phase> counts are left empty" >&2
+        fi
+        # empty counts keep the columns of every run the same
+        for call in munmap madvise brk; do
+            for phase in alloc free idle realloc; do
+                echo "trim-$call-$phase,"
+            done
+        done >> time.out
+    fi
+    ;;
+*)
+    echo "Usage: $0 run|postrun small|large|mixed"
+    exit -1
+    ;;
+esac
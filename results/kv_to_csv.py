@@ -5,8 +5,11 @@ import csv
 import sys
 import os
 
-import os
-import sys
+
+# every time.csv ends with a status ('ok', 'failed' or 'missing') and the reason of a non-ok status,
+# so analysis/calculate.py can tell failed and missing repeats apart instead of finding an empty file
+def status_row(status, reason=''):
+    return ['status', 'reason'], [status, reason]
 
 def parse_kv_file(path):
     keys = []
@@ -22,10 +25,10 @@ def parse_kv_file(path):
                 for line in log_file:
                     if 'core dumped' in line:
                         print(f"Warning: 'core dumped' found in {log_path}", file=sys.stderr)
-                        return [], []
+                        return status_row('failed', 'core dumped')
         except Exception as e:
             print(f"Error reading {log_path}: {e}", file=sys.stderr)
-            return [], []
+            return status_row('failed', 'unreadable benchmark.log')
 
     # 2) Skip if time.out indicates a command failure
     time_path = os.path.join(base_dir, 'time.out')
@@ -35,10 +38,10 @@ def parse_kv_file(path):
                 for line in time_file:
                     if 'Command exited' in line:
                         print(f"Warning: 'Command exited' found in {time_path}", file=sys.stderr)
-                        return [], []
+                        return status_row('failed', 'command exited with a non-zero status')
         except Exception as e:
             print(f"Error reading {time_path}: {e}", file=sys.stderr)
-            return [], []
+            return status_row('failed', 'unreadable time.out')
 
     # 3) Proceed with parsing the key-value CSV
     try:
@@ -52,12 +55,15 @@ def parse_kv_file(path):
                 values.append(value.strip())
     except FileNotFoundError:
         print(f"Error: file not found: {path}", file=sys.stderr)
-        return [], []
+        return status_row('missing', 'no ' + os.path.basename(path))
     except Exception as e:
         print(f"Error while reading {path}: {e}", file=sys.stderr)
-        return [], []
+        return status_row('failed', 'unreadable ' + os.path.basename(path))
 
-    return keys, values
+    if not keys:
+        return status_row('failed', 'no measurements')
+    status_keys, status_values = status_row('ok')
+    return keys + status_keys, values + status_values
 
 
 if __name__ == '__main__':
@@ -0,0 +1,44 @@
+#! /usr/bin/env python3
+
+# helpers shared by the scripts that drive many (malloc, benchmark, repeat)
+# runs at once, so they all build the same experiments/ layout as template.mk
+
+import sys
+import os
+import shlex
+from os.path import join, isdir
+
+RUN_BENCHMARK = join(os.path.dirname(os.path.abspath(__file__)), 'runBenchmark.py')
+
+def read_list(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def resolve_benchmark_dir(benchmark, benchmarks_roots):
+    # the first root that contains the benchmark wins
+    for root in benchmarks_roots:
+        benchmark_dir = join(root, benchmark)
+        if isdir(benchmark_dir):
+            return benchmark_dir
+    sys.exit('Error: the benchmark ' + benchmark + ' was not found under ' + ' '.join(benchmarks_roots))
+
+def malloc_library(malloc, lib_dir):
+    return join(lib_dir, 'lib' + malloc + '.so')
+
+def submit_command(submit_template, malloc, lib_dir):
+    # the template may refer to {malloc} and {library}, e.g.
+    # "runMalloc.py --library {library}"
+    return submit_template.format(malloc=malloc, library=malloc_library(malloc, lib_dir))
+
+def repeat_name(repeat):
+    return repeat if str(repeat).startswith('repeat') else 'repeat' + str(repeat)
+
+def output_dir(experiments_dir, malloc, benchmark, repeat):
+    return join(experiments_dir, malloc, benchmark, repeat_name(repeat))
+
+def run_benchmark_command(benchmark_dir, output_dir, submit_command, extra_args=[]):
+    return [RUN_BENCHMARK, '--submit_command', submit_command] + list(extra_args) + \
+            ['--', benchmark_dir, output_dir]
+
+def format_command(command):
+    return ' '.join(shlex.quote(c) for c in command)
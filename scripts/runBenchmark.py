@@ -6,11 +6,64 @@ import time
 import subprocess
 import shutil
 import shlex
+import mmap
 import csv
+import json
+import hashlib
+import ctypes
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join, getsize, islink
 
+import benchmarkJobs
+
+# files written by the harness itself rather than read by the benchmark
+HARNESS_FILES = ['benchmark.log', 'events.jsonl', 'time.out']
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.mmap.restype = ctypes.c_void_p
+_libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+_libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+_libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+MAP_FAILED = ctypes.c_void_p(-1).value
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def read_sequentially(path, chunk_size=8*1024*1024):
+    # large sequential reads pull the whole file into the page cache
+    buf = bytearray(chunk_size)
+    with open(path, 'rb', buffering=0) as f:
+        while f.readinto(buf):
+            pass
+
+def advise_willneed(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+def resident_pages(path):
+    # returns (resident pages, total pages) of the file, using mincore over a read-only mapping
+    size = getsize(path)
+    pages = (size + PAGE_SIZE - 1) // PAGE_SIZE
+    if pages == 0:
+        return 0, 0
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        addr = _libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if addr == MAP_FAILED:
+            raise OSError(ctypes.get_errno(), 'mmap failed for ' + path)
+        try:
+            vec = (ctypes.c_ubyte * pages)()
+            if _libc.mincore(addr, size, vec) != 0:
+                raise OSError(ctypes.get_errno(), 'mincore failed for ' + path)
+            return sum(v & 1 for v in vec), pages
+        finally:
+            _libc.munmap(addr, size)
+    finally:
+        os.close(fd)
+
 class BenchmarkRun:
-    def __init__(self, benchmark_dir, output_dir):
+    def __init__(self, benchmark_dir, output_dir, calibration_cache=None):
         self._benchmark_dir = benchmark_dir
         if not os.path.exists(self._benchmark_dir):
             sys.exit('Error: the benchmark path ' + self._benchmark_dir + ' was not found.')
@@ -18,47 +71,142 @@ class BenchmarkRun:
         self._output_dir = os.getcwd() + '/' + output_dir
         print('creating a new output directory', self._output_dir, '...')
         print('copying the benchmark files to ' + self._output_dir + '...')
+        self._bytes_copied = 0
+        start = time.monotonic()
         # symlinks are copied as symlinks with symlinks=True
-        shutil.copytree(self._benchmark_dir, self._output_dir, symlinks=True)
+        shutil.copytree(self._benchmark_dir, self._output_dir, symlinks=True,
+                copy_function=self._counting_copy)
+        end = time.monotonic()
 
         log_file_name = self._output_dir + '/benchmark.log'
         self._log_file = open(log_file_name, 'w')
+        # a JSON-lines log of every harness phase with monotonic timestamps,
+        # summarized across a campaign by analysis/overhead.py
+        self._events_file = open(self._output_dir + '/events.jsonl', 'w')
+        self._event('copytree', start, end, bytes_copied=self._bytes_copied)
+        self._iteration_index = 0
+        self._calibration_cache = calibration_cache
+        if calibration_cache is not None:
+            # resolved now, as the runs change the working directory
+            self._calibration_cache = os.path.abspath(calibration_cache)
+            self._calibration_input_hash = self._input_hash()
+            self._calibration_benchmark = '/'.join(os.path.abspath(benchmark_dir).split(os.sep)[-2:])
         self.iterationEvaluated = False
-        self.iterations = self.get_num_iterations() 
+        self.iterations = 1
         self._time_out_file=None
         self.minRunTime = 30 
+        self._input_resident_pct = None
+        # set for runs measured again outside their campaign slot (--rerun_list)
+        self.rerun = False
     def __del__(self):
         if hasattr(self, "_log_file"):
             self._log_file.close()
+        if hasattr(self, "_events_file"):
+            self._events_file.close()
+
+    def _counting_copy(self, src, dst):
+        dst = shutil.copy2(src, dst)
+        self._bytes_copied += getsize(dst)
+        return dst
+
+    def _event(self, phase, start, end, **fields):
+        event = {'phase': phase, 'start': start, 'end': end, 'duration': end - start}
+        event.update(fields)
+        self._events_file.write(json.dumps(event) + '\n')
+        self._events_file.flush()
+
+    def _input_hash(self):
+        # a hash of the benchmark files (names and sizes), so changed inputs are recalibrated; not of
+        # their mtimes, so hosts with separately copied benchmark trees share the calibration
+        input_hash = hashlib.sha256()
+        for root, dirs, names in sorted(os.walk(self._benchmark_dir, followlinks=True)):
+            for name in sorted(names):
+                path = join(root, name)
+                if os.path.isfile(path):
+                    input_hash.update('{}\0{}\0'.format(
+                        os.path.relpath(path, self._benchmark_dir), getsize(path)).encode())
+        return input_hash.hexdigest()[:16]
+
+    def _calibration_path(self, num_threads):
+        # calibrations are shared by all mallocs and repeats of a benchmark
+        return join(self._calibration_cache, '{}__t{}__{}.json'.format(
+            self._calibration_benchmark.replace('/', '__'), num_threads, self._calibration_input_hash))
+
+    def load_calibration(self, num_threads):
+        if self._calibration_cache is None:
+            return None
+        path = self._calibration_path(num_threads)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            calibration = json.load(f)
+        if calibration.get('min_run_time') != self.minRunTime:
+            return None
+        return calibration
+
+    def store_calibration(self, num_threads, seconds):
+        if self._calibration_cache is None:
+            return
+        os.makedirs(self._calibration_cache, exist_ok=True)
+        path = self._calibration_path(num_threads)
+        if os.path.exists(path):
+            # the first calibration is kept (the baseline malloc's, when make schedules it first)
+            return
+        calibration = {'benchmark': self._calibration_benchmark, 'num_threads': num_threads,
+                'min_run_time': self.minRunTime, 'seconds': seconds, 'iterations': self.iterations,
+                'output_dir': self._output_dir}
+        tmp_path = path + '.tmp.' + str(os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(calibration, f, indent=2)
+        os.replace(tmp_path, path)
 
-    def get_num_iterations(self):
-        # this fucntion checks if there any repetitions of all the 
-        norm = os.path.normpath(self._output_dir)           
-        pathsplitted = [p for p in norm.split(os.sep) if p]  
-        pathsplittedUnrepeated=pathsplitted[:-1]
-        mallocs = ['mimalloc','dlmalloc','ptmalloc2']
-        indexOfMalloc=4
-        it = 1
-        for malloc in mallocs:
-            tempL=pathsplittedUnrepeated.copy()
-            tempL[4]=malloc 
-            time_out_path_abs = os.path.join(os.sep, *tempL, "repeat1", "time.out")        
-            if os.path.exists(time_out_path_abs) == True:
-                with open (time_out_path_abs,"r") as f:
-                    kv = {k.strip(): v.strip() for k, v in csv.reader(f) if k}
-                    iterations = kv.get("iterations")
-                    if iterations is not None:
-                        it = int(float(iterations))
-                        self.iterationEvaluated = True
-                        break 
-        #print(f"the number of init iterations is {it}")
-        return it
     def prerun(self):
         print('warming up before running...')
         os.chdir(self._output_dir)
+        start = time.monotonic()
         # the prerun script will read input files to force them to reside
         # in the page-cache before run() is invoked.
         subprocess.check_call('./prerun.sh', stdout=self._log_file, stderr=self._log_file)
+        self._event('prerun', start, time.monotonic())
+
+    def input_files(self):
+        # every regular file of the benchmark, including the input files that copytree
+        # kept as symlinks; symlinked directories (shared data trees) are not descended
+        files = set()
+        for root, dirs, names in os.walk(self._output_dir):
+            for name in names:
+                path = join(root, name)
+                if name not in HARNESS_FILES and os.path.isfile(path):
+                    files.add(os.path.realpath(path))
+        return sorted(files)
+
+    def warmup(self, method='read', min_resident_pct=90, retries=2, num_threads=4):
+        print('verifying that the benchmark inputs reside in the page-cache...')
+        files = self.input_files()
+        total_bytes = sum(getsize(f) for f in files)
+        warm = {'read': read_sequentially, 'fadvise': advise_willneed}.get(method)
+        for attempt in range(retries + 1):
+            start = time.monotonic()
+            if warm is not None:
+                with ThreadPoolExecutor(max_workers=num_threads) as pool:
+                    list(pool.map(warm, files))
+            resident, pages = 0, 0
+            for f in files:
+                r, p = resident_pages(f)
+                resident += r
+                pages += p
+            self._input_resident_pct = 100.0 * resident / pages if pages else 100.0
+            self._event('warmup', start, time.monotonic(), attempt=attempt, method=method,
+                    files=len(files), bytes=total_bytes, resident_pct=self._input_resident_pct)
+            print('{:.1f}% of the {} input bytes are resident'.format(self._input_resident_pct, total_bytes))
+            if warm is None or self._input_resident_pct >= min_resident_pct:
+                return
+            if attempt < retries:
+                # fadvise is asynchronous, and reads may be racing with reclaim; give both a moment
+                time.sleep(1)
+        # e.g., inputs larger than the free memory; the run goes on with input-resident-pct recorded
+        print('Warning: only {:.1f}% of the inputs of {} reside in the page-cache (< {}%).'.format(
+            self._input_resident_pct, self._benchmark_dir, min_resident_pct))
 
     def run(self, num_threads, submit_command):
         print('running the benchmark ' + self._benchmark_dir + '...')
@@ -67,15 +215,22 @@ class BenchmarkRun:
                 "OMP_THREAD_LIMIT": str(num_threads)}
         environment_variables.update(os.environ)
         os.chdir(self._output_dir)
+        self._run_start = time.monotonic()
         self._run_process = subprocess.Popen(shlex.split(submit_command + ' ./run.sh'),
                 stdout=self._log_file, stderr=self._log_file, env=environment_variables)
 
     def wait(self,num_threads, submit_command):
         print('waiting for the run to complete...')
         time_out_path = self._output_dir + '/time.out'
+        calibration = self.load_calibration(num_threads)
+        if calibration is not None:
+            print('using the cached calibration of', calibration['iterations'], 'iterations')
+            self.iterations = calibration['iterations']
+            self.iterationEvaluated = True
         it = self.iterations
         while True:
             self._run_process.wait()
+            run_end = time.monotonic()
             with open(time_out_path, 'r') as f:
                 current_time_out = {k.strip(): float(v) for k, v in csv.reader(f)}
                 currentSeconds=current_time_out['seconds-elapsed']
@@ -87,16 +242,22 @@ class BenchmarkRun:
                         self._time_out_file[key]+=current_time_out[key]
 
                 #the section above is for agregating the result of the runs 
-            if self._time_out_file['seconds-elapsed']  < self.minRunTime and self.iterationEvaluated == False:
-                # current run time isn't enough we have to perform a loop
-                #print('evalutaed ')
-                self.iterations = iters = int(self.minRunTime // currentSeconds) + 1
-                it = self.iterations
+            calibrating = self.iterationEvaluated == False
+            if calibrating:
+                if self._time_out_file['seconds-elapsed'] < self.minRunTime:
+                    # current run time isn't enough we have to perform a loop
+                    self.iterations = int(self.minRunTime // max(currentSeconds, 0.01)) + 1
+                    it = self.iterations
                 #print(f"new iterations number is : f{it}")
                 self.iterationEvaluated=True
-                self._time_out_file=None
-                self.run(num_threads,submit_command)
-                continue
+                if self._run_process.returncode == 0:
+                    self.store_calibration(num_threads, currentSeconds)
+            self._iteration_index += 1
+            # the launch overhead is the iteration wall time not covered by seconds-elapsed;
+            # the calibration iteration is kept as the first of the measured iterations
+            self._event('iteration', self._run_start, run_end, index=self._iteration_index,
+                    calibration=calibrating, benchmark_seconds=currentSeconds,
+                    returncode=self._run_process.returncode)
             #print(" passed the first run and a new run time has been calculated ")
             it -= 1
             #print (f'it ={it} and self itertations={self.iterations}')
@@ -109,26 +270,42 @@ class BenchmarkRun:
                 break
         with open(time_out_path, "w") as f:
             self._time_out_file['iterations']=self.iterations
+            if self._input_resident_pct is not None:
+                self._time_out_file['input-resident-pct']=self._input_resident_pct
+            if self.rerun:
+                self._time_out_file['rerun']=1
             writer = csv.writer(f)
             writer.writerows(self._time_out_file.items())
         print('sleeping a bit to let the filesystem recover...')
+        start = time.monotonic()
         time.sleep(3) # seconds
+        self._event('sleep', start, time.monotonic())
 
     def postrun(self):
         print('validating the run outputs...')
         os.chdir(self._output_dir)
+        start = time.monotonic()
         subprocess.check_call('./postrun.sh', stdout=self._log_file, stderr=self._log_file)
+        self._event('postrun', start, time.monotonic())
 
     def clean(self, exclude_files=[], threshold=1024*1024):
         print('cleaning large files from the output directory...')
+        start = time.monotonic()
+        bytes_deleted = 0
+        files_deleted = 0
         for root, dirs, files in os.walk('./'):
             for name in files:
                 file_path = join(root, name)
                 # remove files larger than threshold (default is 1MB)
                 if (not islink(file_path)) and (getsize(file_path) > threshold) and (name not in exclude_files):
+                    bytes_deleted += getsize(file_path)
+                    files_deleted += 1
                     os.remove(file_path)
+        self._event('clean', start, time.monotonic(), bytes_deleted=bytes_deleted, files_deleted=files_deleted)
         print('syncing to clean all pending I/O activity...')
+        start = time.monotonic()
         os.sync()
+        self._event('sync', start, time.monotonic())
 
 import argparse
 def getCommandLineArguments():
@@ -145,23 +322,115 @@ def getCommandLineArguments():
             help='list of files to not remove')
     parser.add_argument('-f', '--force', action='store_true', default=False,
             help='run the benchmark anyway even if the output directory already exists')
-    parser.add_argument('benchmark_dir', type=str, help='the benchmark directory, must contain three \
+    parser.add_argument('-w', '--warmup', type=str, choices=['read', 'fadvise', 'none'], default='read',
+            help='how to pull the benchmark inputs into the page-cache after prerun.sh: sequential reads, \
+            posix_fadvise(WILLNEED), or none (the residency is only measured)')
+    parser.add_argument('--min_resident_pct', type=float, default=90,
+            help='retry the warmup, and then warn, if less than this percentage of the inputs reside in the page-cache')
+    parser.add_argument('--warmup_retries', type=int, default=2,
+            help='the number of times the warmup is retried before warning')
+    parser.add_argument('-c', '--calibration_cache', type=str, default=os.environ.get('CALIBRATION_CACHE_DIR'),
+            help='directory of the cached iteration calibrations, shared by all mallocs and repeats \
+            (default: $CALIBRATION_CACHE_DIR; with --rerun_list, <experiments_dir>/calibration_cache; \
+            otherwise every run calibrates)')
+    parser.add_argument('--rerun_list', type=str, default=None,
+            help='instead of a single benchmark, measure again the (malloc, benchmark, repeat) runs \
+            listed in this CSV (written by analysis/calculate.py --rerun-list)')
+    parser.add_argument('--benchmarks_root', type=str, nargs='+', default=[],
+            help='with --rerun_list: directories containing the benchmarks; the first one that has a benchmark wins')
+    parser.add_argument('--lib_dir', type=str, default=None,
+            help='with --rerun_list: the directory containing the lib<malloc>.so libraries')
+    parser.add_argument('--submit_template', type=str, default=None,
+            help='with --rerun_list: the submit command of every run, {malloc} and {library} are substituted')
+    parser.add_argument('-e', '--experiments_dir', type=str, default='experiments',
+            help='with --rerun_list: the (relative) experiments directory of the runs')
+    parser.add_argument('-r', '--results_dir', type=str, default='results',
+            help='with --rerun_list: the results directory whose stale time.csv files are removed')
+    parser.add_argument('benchmark_dir', type=str, nargs='?', help='the benchmark directory, must contain three \
             bash scripts: prerun.sh, run.sh, and postrun.sh')
-    parser.add_argument('output_dir', type=str, help='the output directory which will be created for \
+    parser.add_argument('output_dir', type=str, nargs='?', help='the output directory which will be created for \
             running the benchmark on a clean slate')
     args = parser.parse_args()
+    if args.rerun_list is None and args.output_dir is None:
+        parser.error('the benchmark_dir and output_dir arguments are required without --rerun_list')
+    if args.rerun_list is not None and not (args.benchmarks_root and args.lib_dir and args.submit_template):
+        parser.error('--rerun_list requires --benchmarks_root, --lib_dir, and --submit_template')
     return args
 
+def run_benchmark(args, benchmark_dir, output_dir, submit_command, rerun=False):
+    benchmark_run = BenchmarkRun(benchmark_dir, output_dir, args.calibration_cache)
+    benchmark_run.rerun = rerun
+    benchmark_run.prerun()
+    benchmark_run.warmup(args.warmup, args.min_resident_pct, args.warmup_retries, args.num_threads)
+    benchmark_run.run(args.num_threads, submit_command)
+    benchmark_run.wait(args.num_threads, submit_command)
+    benchmark_run.postrun()
+    benchmark_run.clean(args.exclude_files)
+
+def rejected_dir(output_dir):
+    # the first free <output_dir>.rejected[N], so earlier rejected outputs are kept too
+    rejected = output_dir + '.rejected'
+    suffix = 1
+    while os.path.exists(rejected):
+        suffix += 1
+        rejected = output_dir + '.rejected' + str(suffix)
+    return rejected
+
+def rerun_benchmarks(args):
+    if not os.path.exists(args.rerun_list):
+        sys.exit('Error: the rerun list ' + args.rerun_list + ' was not found.')
+    with open(args.rerun_list, newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        jobs = list(reader)
+    # the runs measured again reuse the iteration counts of the campaign they belong to
+    if args.calibration_cache is None:
+        args.calibration_cache = join(args.experiments_dir, 'calibration_cache')
+    cwd = os.getcwd()
+    failed = []
+    failed_jobs = []
+    for job in jobs:
+        # every run changes into its output directory
+        os.chdir(cwd)
+        output_dir = benchmarkJobs.output_dir(args.experiments_dir, job['malloc'], job['benchmark'], job['repeat'])
+        print('measuring', output_dir, 'again because of:', job['reason'])
+        try:
+            benchmark_dir = benchmarkJobs.resolve_benchmark_dir(job['benchmark'], args.benchmarks_root)
+            submit_command = benchmarkJobs.submit_command(args.submit_template, job['malloc'], args.lib_dir)
+            if os.path.exists(output_dir):
+                rejected = rejected_dir(output_dir)
+                print('moving the rejected output directory to', rejected)
+                os.rename(output_dir, rejected)
+            # the stale result is rebuilt from the new time.out by "make results"
+            result_csv = join(benchmarkJobs.output_dir(args.results_dir, job['malloc'], job['benchmark'], job['repeat']), 'time.csv')
+            if os.path.exists(result_csv):
+                os.remove(result_csv)
+            run_benchmark(args, benchmark_dir, output_dir, submit_command, rerun=True)
+        except (subprocess.CalledProcessError, SystemExit) as e:
+            print('Error: the run', output_dir, 'failed:', e)
+            failed.append(output_dir)
+            failed_jobs.append(job)
+    os.chdir(cwd)
+    if failed_jobs:
+        # only the failed runs stay listed, so running the list again retries just them
+        with open(args.rerun_list, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(failed_jobs)
+    else:
+        # a consumed list is set aside, so running it again does not replace the new measurements
+        os.replace(args.rerun_list, args.rerun_list + '.done')
+    print('measured', len(jobs) - len(failed), 'of', len(jobs), 'runs again')
+    if failed:
+        sys.exit('Error: ' + str(len(failed)) + ' runs failed: ' + ' '.join(failed))
+
 if __name__ == "__main__":
     args = getCommandLineArguments()
 
-    if os.path.exists(args.output_dir):
+    if args.rerun_list is not None:
+        rerun_benchmarks(args)
+    elif os.path.exists(args.output_dir):
         print('Skipping the run because output directory', args.output_dir, 'already exists.')
         print('You can use the \'-f\' flag to suppress this message and run the benchmark anyway.')
     else:
-        benchmark_run = BenchmarkRun(args.benchmark_dir, args.output_dir)
-        benchmark_run.prerun()
-        benchmark_run.run(args.num_threads, args.submit_command)
-        benchmark_run.wait(args.num_threads, args.submit_command)
-        benchmark_run.postrun()
-        benchmark_run.clean(args.exclude_files)
\ No newline at end of file
+        run_benchmark(args, args.benchmark_dir, args.output_dir, args.submit_command)
\ No newline at end of file
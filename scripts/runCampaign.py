@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+
+import sys
+import os
+import csv
+import time
+import random
+import argparse
+import subprocess
+from collections import namedtuple
+
+import benchmarkJobs
+
+Job = namedtuple('Job', ['kind', 'malloc', 'benchmark', 'repeat'])
+
+CAMPAIGN_LOG_FIELDS = ['seed', 'position', 'kind', 'malloc', 'benchmark', 'repeat',
+        'output_dir', 'start_time', 'end_time', 'returncode']
+
+def build_schedule(mallocs, benchmarks, repeats, seed, shuffle_benchmarks=False):
+    # every repeat of a benchmark is one randomized block containing each
+    # malloc exactly once (e.g., ABC, CAB, BCA), so slow drift over the
+    # campaign spreads evenly over all mallocs instead of biasing one of them
+    rng = random.Random(seed)
+    benchmarks = list(benchmarks)
+    if shuffle_benchmarks:
+        rng.shuffle(benchmarks)
+    schedule = []
+    for benchmark in benchmarks:
+        for repeat in range(1, repeats + 1):
+            block = list(mallocs)
+            rng.shuffle(block)
+            schedule += [Job('run', malloc, benchmark, benchmarkJobs.repeat_name(repeat)) for malloc in block]
+    return schedule
+
+def insert_probes(schedule, probe_malloc, probe_benchmark, probe_every):
+    # run the reference probe before the first job, after every probe_every
+    # jobs, and after the last job so drift can be interpolated everywhere
+    with_probes = []
+    probe_count = 0
+    def add_probe():
+        nonlocal probe_count
+        probe_count += 1
+        with_probes.append(Job('probe', probe_malloc, probe_benchmark, 'probe' + str(probe_count)))
+    add_probe()
+    for i, job in enumerate(schedule, start=1):
+        with_probes.append(job)
+        if i % probe_every == 0 or i == len(schedule):
+            add_probe()
+    return with_probes
+
+def job_output_dir(job, experiments_dir):
+    if job.kind == 'probe':
+        return os.path.join(experiments_dir, 'probes', job.benchmark, job.repeat)
+    return benchmarkJobs.output_dir(experiments_dir, job.malloc, job.benchmark, job.repeat)
+
+def open_campaign_log(path):
+    is_new = not os.path.exists(path)
+    log_file = open(path, 'a', newline='')
+    writer = csv.DictWriter(log_file, fieldnames=CAMPAIGN_LOG_FIELDS)
+    if is_new:
+        writer.writeheader()
+    return log_file, writer
+
+def getCommandLineArguments():
+    parser = argparse.ArgumentParser(description='This python script runs a whole campaign of \
+            (malloc, benchmark, repeat) runs in a randomized, interleaved order. Each repeat of a \
+            benchmark is a block that runs every malloc once in a seeded random order, and a \
+            reference probe is run periodically so the analysis can detect and correct drift. \
+            Every run is delegated to runBenchmark.py and lands in the usual experiments layout.')
+    parser.add_argument('-m', '--mallocs', type=str, required=True,
+            help='text file containing the list of malloc implementations')
+    parser.add_argument('-b', '--benchmarks', type=str, required=True,
+            help='text file containing the list of benchmarks')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+            help='the number of repeats (randomized blocks) per benchmark')
+    parser.add_argument('--seed', type=int, default=None,
+            help='the seed of the randomized order (default: a fresh seed, recorded in the campaign log)')
+    parser.add_argument('--shuffle_benchmarks', action='store_true', default=False,
+            help='randomize the order of the benchmarks too')
+    parser.add_argument('--benchmarks_root', type=str, nargs='+', required=True,
+            help='directories containing the benchmarks; the first one that has a benchmark wins')
+    parser.add_argument('--lib_dir', type=str, required=True,
+            help='the directory containing the lib<malloc>.so libraries')
+    parser.add_argument('-s', '--submit_template', type=str, required=True,
+            help='the submit command of every run, {malloc} and {library} are substituted')
+    parser.add_argument('-e', '--experiments_dir', type=str, default='experiments',
+            help='the (relative) experiments directory to write the run outputs to')
+    parser.add_argument('-c', '--calibration_cache', type=str, default=None,
+            help='directory of the iteration calibrations shared by all runs (default: <experiments_dir>/calibration_cache)')
+    parser.add_argument('--probe_benchmark', type=str, default=None,
+            help='a short benchmark used as the periodic reference probe (default: no probes)')
+    parser.add_argument('--probe_malloc', type=str, default='ptmalloc2',
+            help='the malloc the reference probe runs with')
+    parser.add_argument('--probe_every', type=int, default=None,
+            help='run the probe after this many jobs (default: once per benchmark)')
+    parser.add_argument('--dry_run', action='store_true', default=False,
+            help='only print the schedule')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = getCommandLineArguments()
+
+    mallocs = benchmarkJobs.read_list(args.mallocs)
+    benchmarks = benchmarkJobs.read_list(args.benchmarks)
+    seed = args.seed if args.seed is not None else random.SystemRandom().randrange(2**32)
+    print('the campaign seed is', seed)
+
+    schedule = build_schedule(mallocs, benchmarks, args.repeats, seed, args.shuffle_benchmarks)
+    if args.probe_benchmark:
+        probe_every = args.probe_every or len(mallocs) * args.repeats
+        schedule = insert_probes(schedule, args.probe_malloc, args.probe_benchmark, probe_every)
+
+    if args.dry_run:
+        for position, job in enumerate(schedule):
+            print(position, job.kind, job.malloc, job.benchmark, job.repeat)
+        sys.exit(0)
+
+    os.makedirs(args.experiments_dir, exist_ok=True)
+    log_file, log_writer = open_campaign_log(os.path.join(args.experiments_dir, 'campaign.csv'))
+    # every run of a benchmark reuses the iteration count of its first run, whatever the environment
+    calibration_cache = os.path.abspath(args.calibration_cache or os.path.join(args.experiments_dir, 'calibration_cache'))
+    # the probes calibrate once, with the probe malloc, in a cache of their own
+    probe_calibration_cache = os.path.abspath(os.path.join(args.experiments_dir, 'probes', 'calibration_cache'))
+    failures = 0
+    for position, job in enumerate(schedule):
+        output_dir = job_output_dir(job, args.experiments_dir)
+        if os.path.exists(output_dir):
+            # resuming a campaign with the same seed skips what already ran
+            print('Skipping', output_dir, 'because it already exists.')
+            continue
+        benchmark_dir = benchmarkJobs.resolve_benchmark_dir(job.benchmark, args.benchmarks_root)
+        submit_command = benchmarkJobs.submit_command(args.submit_template, job.malloc, args.lib_dir)
+        extra_args = ['--calibration_cache', probe_calibration_cache if job.kind == 'probe' else calibration_cache]
+        command = benchmarkJobs.run_benchmark_command(benchmark_dir, output_dir, submit_command, extra_args)
+        print('========== [INFO] [{}/{}] {} {} {} {} =========='.format(
+            position + 1, len(schedule), job.kind, job.malloc, job.benchmark, job.repeat))
+        start_time = time.time()
+        returncode = subprocess.call(command)
+        end_time = time.time()
+        if returncode != 0:
+            failures += 1
+            print('Error: the run failed with return code', returncode, ':', benchmarkJobs.format_command(command))
+        log_writer.writerow({'seed': seed, 'position': position, 'kind': job.kind,
+                'malloc': job.malloc, 'benchmark': job.benchmark, 'repeat': job.repeat,
+                'output_dir': output_dir, 'start_time': start_time, 'end_time': end_time,
+                'returncode': returncode})
+        log_file.flush()
+    log_file.close()
+
+    if failures:
+        sys.exit(f'Error: {failures} runs of the campaign failed.')
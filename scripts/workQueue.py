@@ -0,0 +1,351 @@
+#! /usr/bin/env python3
+
+import sys
+import os
+import csv
+import json
+import time
+import shutil
+import signal
+import socket
+import hashlib
+import platform
+import argparse
+import threading
+import subprocess
+import importlib.util
+import multiprocessing
+
+import benchmarkJobs
+
+# The queue is a shared directory; every state change of a job is a single
+# os.rename, which is atomic on a shared filesystem, so any number of workers
+# on any number of hosts can claim jobs without a lock server:
+#
+#   pending/<job>.json                -- waiting to be claimed
+#   claimed/<job>.json@<worker>       -- being run; its mtime is the worker's heartbeat
+#   done/<job>.json, failed/<job>.json -- finished, with the host fingerprint and output dir
+#   outputs/<host>/<worker>/...       -- the runBenchmark.py outputs
+#   calibration_cache/                -- the iteration counts shared by all workers (unless init -c)
+#
+# A job may name an 'after' job (the calibration run of its benchmark); it is
+# not claimed before that job is done or failed.
+QUEUE_STATES = ['pending', 'claimed', 'done', 'failed']
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def host_fingerprint():
+    fingerprint = {'hostname': socket.gethostname(), 'kernel': platform.release(),
+            'machine': platform.machine(), 'cpus': os.cpu_count(), 'cpu_model': None, 'mem_total_kb': None}
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    fingerprint['cpu_model'] = line.split(':', 1)[1].strip()
+                    break
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal'):
+                    fingerprint['mem_total_kb'] = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+    digest = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:8]
+    fingerprint['host_id'] = fingerprint['hostname'] + '-' + digest
+    return fingerprint
+
+def job_id(malloc, benchmark, repeat):
+    return '__'.join([malloc, benchmark.replace('/', '__'), repeat])
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def write_json(path, content):
+    # write next to the final name and rename, so readers never see a partial file
+    tmp_path = path + '.tmp.' + str(os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(content, f, indent=2)
+    os.replace(tmp_path, path)
+
+class WorkQueue:
+    def __init__(self, queue_dir):
+        self._queue_dir = queue_dir
+        if not os.path.isfile(self.path('config.json')):
+            sys.exit('Error: ' + queue_dir + ' is not a work queue, create it with the init command.')
+        self.config = read_json(self.path('config.json'))
+
+    def path(self, *parts):
+        return os.path.join(self._queue_dir, *parts)
+
+    @staticmethod
+    def create(queue_dir, config, jobs):
+        for state in QUEUE_STATES + ['outputs']:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+        write_json(os.path.join(queue_dir, 'config.json'), config)
+        queue = WorkQueue(queue_dir)
+        added = 0
+        for job in jobs:
+            name = job_id(job['malloc'], job['benchmark'], job['repeat']) + '.json'
+            # jobs that are already queued, running or finished are left alone
+            if any(queue._exists(state, name) for state in QUEUE_STATES):
+                continue
+            write_json(queue.path('pending', name), job)
+            added += 1
+        return added
+
+    def _exists(self, state, name):
+        if state == 'claimed':
+            return any(n.startswith(name + '@') for n in os.listdir(self.path('claimed')))
+        return os.path.exists(self.path(state, name))
+
+    def _jobs(self, state):
+        # hidden files are jobs in the middle of a state change
+        return sorted(n for n in os.listdir(self.path(state)) if not n.startswith('.') and '.tmp.' not in n)
+
+    def counts(self):
+        return {state: len(self._jobs(state)) for state in QUEUE_STATES}
+
+    def reclaim_stale(self, stale_seconds):
+        now = time.time()
+        for name in self._jobs('claimed'):
+            claimed_path = self.path('claimed', name)
+            try:
+                if now - os.stat(claimed_path).st_mtime < stale_seconds:
+                    continue
+                os.rename(claimed_path, self.path('pending', name.rsplit('@', 1)[0]))
+                print('reclaimed the stale job', name)
+            except FileNotFoundError:
+                # its worker finished it or another worker reclaimed it first
+                continue
+
+    def _waiting(self, name):
+        try:
+            after = read_json(self.path('pending', name)).get('after')
+        except FileNotFoundError:
+            return False
+        return after is not None and not any(self._exists(state, after) for state in ['done', 'failed'])
+
+    def claim(self, worker_id):
+        for name in self._jobs('pending'):
+            if self._waiting(name):
+                continue
+            claimed_path = self.path('claimed', name + '@' + worker_id)
+            try:
+                os.rename(self.path('pending', name), claimed_path)
+                # the rename keeps the old mtime; a failing heartbeat means it was reclaimed meanwhile
+                os.utime(claimed_path)
+            except FileNotFoundError:
+                continue
+            return name, claimed_path
+        return None, None
+
+    def finish(self, name, claimed_path, state, record):
+        # move the claim away first: if it was reclaimed, the result is dropped and the job reruns elsewhere
+        finishing_path = self.path(state, '.' + os.path.basename(claimed_path))
+        try:
+            os.rename(claimed_path, finishing_path)
+        except FileNotFoundError:
+            return False
+        write_json(self.path(state, name), record)
+        os.remove(finishing_path)
+        return True
+
+def job_command(queue, job, output_dir):
+    config = queue.config
+    benchmark_dir = benchmarkJobs.resolve_benchmark_dir(job['benchmark'], config['benchmarks_roots'])
+    submit_command = benchmarkJobs.submit_command(config['submit_template'], job['malloc'], config['lib_dir'])
+    return benchmarkJobs.run_benchmark_command(benchmark_dir, output_dir, submit_command,
+            ['--num_threads', str(config['num_threads']),
+            # queues created before the option calibrate in the queue directory
+            '--calibration_cache', config.get('calibration_cache', os.path.abspath(queue.path('calibration_cache')))])
+
+def run_job(queue, command, claimed_path, heartbeat_seconds):
+    print('running:', benchmarkJobs.format_command(command))
+    # a session of its own, so a lost job can be stopped together with the benchmark processes
+    process = subprocess.Popen(command, cwd=queue.path(), start_new_session=True)
+    finished = threading.Event()
+    lost = threading.Event()
+
+    def heartbeat():
+        while not finished.wait(heartbeat_seconds):
+            try:
+                os.utime(claimed_path)
+            except FileNotFoundError:
+                lost.set()
+                os.killpg(process.pid, signal.SIGTERM)
+                return
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    returncode = process.wait()
+    finished.set()
+    heartbeat_thread.join()
+    return returncode, lost.is_set()
+
+def work(queue_dir, args):
+    queue = WorkQueue(queue_dir)
+    fingerprint = host_fingerprint()
+    worker_id = fingerprint['host_id'] + '-' + str(os.getpid())
+    print('worker', worker_id, 'started')
+    while True:
+        queue.reclaim_stale(args.stale)
+        name, claimed_path = queue.claim(worker_id)
+        if name is None:
+            if queue.counts()['claimed'] == 0 or not args.wait:
+                break
+            # other workers are still running jobs that may go stale
+            time.sleep(args.heartbeat)
+            continue
+        job = read_json(claimed_path)
+        job['attempts'] = job.get('attempts', 0) + 1
+        output_dir = os.path.join('outputs', fingerprint['host_id'], worker_id,
+                job['malloc'], job['benchmark'], job['repeat'], 'attempt' + str(job['attempts']))
+        start_time = time.time()
+        try:
+            command = job_command(queue, job, output_dir)
+        except (SystemExit, Exception) as e:
+            # e.g., a missing benchmark: every attempt on every host would fail the same way
+            print('the job', name, 'cannot be run:', e)
+            queue.finish(name, claimed_path, 'failed', dict(job, host=fingerprint, worker=worker_id,
+                    output_dir=output_dir, start_time=start_time, end_time=time.time(), returncode=None, reason=str(e)))
+            continue
+        returncode, lost = run_job(queue, command, claimed_path, args.heartbeat)
+        if lost:
+            print('the job', name, 'was reclaimed by another worker, dropping its result')
+            continue
+        record = dict(job, host=fingerprint, worker=worker_id, output_dir=output_dir,
+                start_time=start_time, end_time=time.time(), returncode=returncode)
+        if returncode == 0:
+            queue.finish(name, claimed_path, 'done', record)
+        elif job['attempts'] < args.max_attempts:
+            print('the job', name, 'failed with return code', returncode, ', requeueing it')
+            queue.finish(name, claimed_path, 'pending', job)
+        else:
+            print('the job', name, 'failed with return code', returncode, ', giving up')
+            queue.finish(name, claimed_path, 'failed', record)
+    print('worker', worker_id, 'found no more jobs')
+
+def load_kv_to_csv():
+    spec = importlib.util.spec_from_file_location('kv_to_csv', os.path.join(ROOT_DIR, 'results', 'kv_to_csv.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def merge(queue, experiments_dir, results_dir, force):
+    kv_to_csv = load_kv_to_csv()
+    merged = 0
+    for name in queue._jobs('done'):
+        record = read_json(queue.path('done', name))
+        experiment_dir = benchmarkJobs.output_dir(experiments_dir, record['malloc'], record['benchmark'], record['repeat'])
+        if os.path.exists(experiment_dir):
+            if not force:
+                continue
+            shutil.rmtree(experiment_dir)
+        shutil.copytree(queue.path(record['output_dir']), experiment_dir, symlinks=True)
+        write_json(os.path.join(experiment_dir, 'host.json'), record['host'])
+
+        # the standard results tree, with every measurement tagged by the host that produced it
+        result_dir = benchmarkJobs.output_dir(results_dir, record['malloc'], record['benchmark'], record['repeat'])
+        os.makedirs(result_dir, exist_ok=True)
+        keys, values = kv_to_csv.parse_kv_file(os.path.join(experiment_dir, 'time.out'))
+        if keys:
+            keys, values = keys + ['host'], values + [record['host']['host_id']]
+        with open(os.path.join(result_dir, 'time.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            writer.writerow(values)
+        merged += 1
+    print('merged', merged, 'jobs into', experiments_dir, 'and', results_dir)
+
+def getCommandLineArguments():
+    parser = argparse.ArgumentParser(description='This python script runs a campaign through a \
+            file-based work queue in a shared directory, so any number of workers on any number \
+            of hosts can run its (malloc, benchmark, repeat) jobs. Workers claim jobs atomically, \
+            heartbeat while running them, and reclaim the jobs of workers that stopped heartbeating. \
+            A merge step builds the standard experiments/ and results/ trees from the finished jobs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init = subparsers.add_parser('init', help='create the queue (or add missing jobs to it)')
+    init.add_argument('queue_dir', type=str, help='the shared queue directory')
+    init.add_argument('-m', '--mallocs', type=str, required=True,
+            help='text file containing the list of malloc implementations')
+    init.add_argument('-b', '--benchmarks', type=str, required=True,
+            help='text file containing the list of benchmarks')
+    init.add_argument('-r', '--repeats', type=int, default=3, help='the number of repeats per benchmark')
+    init.add_argument('-n', '--num_threads', type=int, default=4,
+            help='the number of threads (for multi-threaded benchmark)')
+    init.add_argument('--benchmarks_root', type=str, nargs='+', required=True,
+            help='directories containing the benchmarks; the first one that has a benchmark wins')
+    init.add_argument('--lib_dir', type=str, required=True,
+            help='the directory containing the lib<malloc>.so libraries')
+    init.add_argument('-s', '--submit_template', type=str, required=True,
+            help='the submit command of every run, {malloc} and {library} are substituted')
+    init.add_argument('-c', '--calibration_cache', type=str, default=None,
+            help='directory of the iteration calibrations shared by all workers (default: <queue_dir>/calibration_cache)')
+    init.add_argument('--calibration_malloc', type=str, default=None,
+            help='the malloc whose first repeat of every benchmark calibrates its iteration count; '
+            'the other jobs of the benchmark wait for it')
+
+    worker = subparsers.add_parser('work', help='run jobs until the queue is empty')
+    worker.add_argument('queue_dir', type=str, help='the shared queue directory')
+    worker.add_argument('-j', '--workers', type=int, default=1,
+            help='the number of worker processes to start on this host')
+    worker.add_argument('--heartbeat', type=float, default=30,
+            help='seconds between heartbeats of a running job')
+    worker.add_argument('--stale', type=float, default=300,
+            help='seconds without a heartbeat after which a claimed job is reclaimed')
+    worker.add_argument('--max_attempts', type=int, default=2,
+            help='the number of times a failing job is run before it is marked failed')
+    worker.add_argument('--no_wait', dest='wait', action='store_false', default=True,
+            help='exit when nothing is pending instead of waiting for the running jobs of other workers')
+
+    merger = subparsers.add_parser('merge', help='build the experiments/ and results/ trees from the finished jobs')
+    merger.add_argument('queue_dir', type=str, help='the shared queue directory')
+    merger.add_argument('-e', '--experiments_dir', type=str, default='experiments',
+            help='the experiments directory to copy the run outputs to')
+    merger.add_argument('-r', '--results_dir', type=str, default='results',
+            help='the results directory to write the time.csv files to')
+    merger.add_argument('-f', '--force', action='store_true', default=False,
+            help='overwrite runs that already exist in the experiments directory')
+
+    status = subparsers.add_parser('status', help='print the number of jobs in every state')
+    status.add_argument('queue_dir', type=str, help='the shared queue directory')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = getCommandLineArguments()
+
+    if args.command == 'init':
+        config = {'benchmarks_roots': [os.path.abspath(r) for r in args.benchmarks_root],
+                'lib_dir': os.path.abspath(args.lib_dir), 'submit_template': args.submit_template,
+                'num_threads': args.num_threads,
+                'calibration_cache': os.path.abspath(args.calibration_cache or os.path.join(args.queue_dir, 'calibration_cache'))}
+        jobs = [{'malloc': malloc, 'benchmark': benchmark, 'repeat': benchmarkJobs.repeat_name(repeat)}
+                for malloc in benchmarkJobs.read_list(args.mallocs)
+                for benchmark in benchmarkJobs.read_list(args.benchmarks)
+                for repeat in range(1, args.repeats + 1)]
+        if args.calibration_malloc in benchmarkJobs.read_list(args.mallocs):
+            for job in jobs:
+                calibration_job = job_id(args.calibration_malloc, job['benchmark'], benchmarkJobs.repeat_name(1))
+                if job_id(job['malloc'], job['benchmark'], job['repeat']) != calibration_job:
+                    job['after'] = calibration_job + '.json'
+        added = WorkQueue.create(args.queue_dir, config, jobs)
+        print('added', added, 'jobs to', args.queue_dir)
+    elif args.command == 'work':
+        if args.workers == 1:
+            work(args.queue_dir, args)
+        else:
+            workers = [multiprocessing.Process(target=work, args=(args.queue_dir, args))
+                    for _ in range(args.workers)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            if any(w.exitcode != 0 for w in workers):
+                sys.exit('Error: some of the workers failed.')
+    elif args.command == 'merge':
+        merge(WorkQueue(args.queue_dir), args.experiments_dir, args.results_dir, args.force)
+    else:
+        for state, count in WorkQueue(args.queue_dir).counts().items():
+            print(state, count)
@@ -18,3 +18,10 @@ benchmarks := $(filter-out hpcc/lat_bw% hpcc/single_stream%, $(benchmarks))
 # include the big workloads from ASPLOS'23 submission
 #benchmarks += gapbs/pr-kron-32GB gapbs/sssp-kron-32GB
 
+# in-repo allocator microbenchmarks (see microbenchmarks/README.md), run with INCLUDE_MICROBENCHMARKS=1
+micro_benchmarks := micro/startup-fork micro/startup-spawn micro/trim-small micro/trim-large micro/trim-mixed \
+	micro/placement micro/cache-scratch micro/cache-thrash
+ifdef INCLUDE_MICROBENCHMARKS
+benchmarks += $(micro_benchmarks)
+endif
+